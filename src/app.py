@@ -1,38 +1,75 @@
-from flask import Flask, render_template
+from flask import Flask, jsonify, render_template, request
 import json
 import os
 import numpy as np
+from artifacts import ArtifactLoader
+from dataset_store import AggregateCache, DatasetStore, DatasetWatcher, column_rows, dataset_version
+from stats.monte_carlo import read_results_npz, risk_metrics, ScenarioIndex
 
 app = Flask(__name__)
 
-# Load the dataset with proper path handling
-def load_dataset():
-    # Try multiple possible paths including models/ and data/ directories
-    possible_paths = [
-        'models/aquaculture_dataset.json',
-        '../models/aquaculture_dataset.json',
-        'data/aquaculture_dataset.json',
-        '../data/aquaculture_dataset.json',
-        '../../models/aquaculture_dataset.json',
-        '../../data/aquaculture_dataset.json',
-        'aquaculture_dataset.json',
-    ]
-    
-    for path in possible_paths:
+# Dataset locations, searched in order
+DATASET_PATHS = [
+    'models/aquaculture_dataset.json',
+    '../models/aquaculture_dataset.json',
+    'data/aquaculture_dataset.json',
+    '../data/aquaculture_dataset.json',
+    '../../models/aquaculture_dataset.json',
+    '../../data/aquaculture_dataset.json',
+    'aquaculture_dataset.json',
+]
+
+# Seconds between checks of the dataset file for changes
+DATASET_RELOAD_INTERVAL = 5.0
+
+def find_dataset():
+    """First existing dataset path, or None"""
+    for path in DATASET_PATHS:
         if os.path.exists(path):
-            print(f"Loading dataset from: {path}")
-            with open(path, 'r') as f:
-                return json.load(f)
-    
-    # If no file found, return empty list
+            return path
+    return None
+
+def load_dataset(path=None):
+    """Build the store from the dataset file (found with find_dataset when no
+    path is given), or an empty store when there is none"""
+    path = path or find_dataset()
+    if path is not None:
+        print(f"Loading dataset from: {path}")
+        with open(path, 'rb') as f:
+            content = f.read()
+        # one array per field, built once for every route
+        return DatasetStore.from_records(json.loads(content), version=dataset_version(path, content))
+    
+    # If no file found, return an empty store
     print("Warning: Could not find aquaculture_dataset.json")
-    print("Searched in:", possible_paths)
-    return []
+    print("Searched in:", DATASET_PATHS)
+    return DatasetStore.from_records([])
+
+# The current store; a background thread rebuilds it when the file changes
+# and swaps it in, so new data shows up without a restart
+dataset_watcher = DatasetWatcher(find_dataset, load_dataset, interval=DATASET_RELOAD_INTERVAL).start()
+
+# Template contexts of the dashboard routes (aggregates and the JSON they
+# serialize), recomputed only when the dataset version changes
+aggregate_cache = AggregateCache()
 
-dataset = load_dataset()
+def cached_context(name, build):
+    # one snapshot per request: a reload mid-request does not mix versions
+    data = dataset_watcher.store
+    return aggregate_cache.get(name, data.version, lambda: build(data))
+
+@app.route('/cache-stats')
+def cache_stats():
+    """Hit rates and compute times of the dashboard aggregate cache and
+    the result file loader, and the dataset watcher's reload state"""
+    return jsonify({**aggregate_cache.stats(), 'artifacts': artifacts.stats(),
+                    'dataset': dataset_watcher.stats()})
 
 @app.route('/')
 def index():
+    return render_template('index.html', **cached_context('index', index_context))
+
+def index_context(dataset):
     # Handle case where dataset might be empty
     if not dataset:
         stats = {
@@ -44,115 +81,79 @@ def index():
         recent_data = []
     else:
         # Calculate summary statistics
-        total_sites = len(set(record['site_id'] for record in dataset))
-        total_cages = len(set(record['cage_id'] for record in dataset))
-        species_count = len(set(record['species'] for record in dataset))
-        avg_survival = sum(record['survival_rate_pct'] for record in dataset) / len(dataset)
-        
         stats = {
-            'total_sites': total_sites,
-            'total_cages': total_cages,
-            'species_count': species_count,
-            'avg_survival': avg_survival
+            'total_sites': dataset.nunique('site_id'),
+            'total_cages': dataset.nunique('cage_id'),
+            'species_count': dataset.nunique('species'),
+            'avg_survival': dataset.mean('survival_rate_pct')
         }
         
         # Get first 10 records for the table
-        recent_data = dataset[:10]
+        recent_data = dataset.records(0, 10)
     
-    return render_template('index.html', stats=stats, recent_data=recent_data)
+    return dict(stats=stats, recent_data=recent_data)
+
+SITE_FIELDS = ('latitude', 'longitude', 'water_depth_m', 'distance_from_shore_km',
+               'avg_current_speed_m_s', 'water_temp_c', 'salinity_psu', 'wave_exposure_index')
 
 @app.route('/sites')
 def sites():
+    return render_template('sites.html', **cached_context('sites', sites_context))
+
+def sites_context(dataset):
     if not dataset:
-        return render_template('sites.html', 
-                             sites=[], 
-                             zone_labels='[]', 
-                             zone_counts='[]', 
-                             species_labels='[]', 
-                             species_counts='[]',
-                             avg_water_temp='0',
-                             avg_salinity='0',
-                             avg_water_depth='0',
-                             avg_current_speed='0',
-                             avg_wave_exposure='0',
-                             top_site_labels='[]',
-                             top_site_counts='[]',
-                             profit_site_ids='[]',
-                             profit_margins='[]')
-    
-    # Aggregate data by site_id
-    sites_dict = {}
-    for record in dataset:
-        site_id = record['site_id']
-        if site_id not in sites_dict:
-            sites_dict[site_id] = {
-                'site_id': site_id,
-                'latitude': record['latitude'],
-                'longitude': record['longitude'],
-                'water_depth_m': record['water_depth_m'],
-                'distance_from_shore_km': record['distance_from_shore_km'],
-                'avg_current_speed_m_s': record['avg_current_speed_m_s'],
-                'water_temp_c': record['water_temp_c'],
-                'salinity_psu': record['salinity_psu'],
-                'wave_exposure_index': record['wave_exposure_index'],
-                'regulatory_zone': record['regulatory_zone'],
-                'cage_count': 0,
-                'total_profit_margin': 0,
-                'record_count': 0
-            }
-        sites_dict[site_id]['cage_count'] += 1
-        sites_dict[site_id]['total_profit_margin'] += record['profit_margin']
-        sites_dict[site_id]['record_count'] += 1
-    
-    # Convert to sorted list
-    sites_list = sorted(sites_dict.values(), key=lambda x: x['site_id'])
+        return dict(
+            sites=[],
+            zone_labels='[]',
+            zone_counts='[]',
+            species_labels='[]',
+            species_counts='[]',
+            avg_water_temp='0',
+            avg_salinity='0',
+            avg_water_depth='0',
+            avg_current_speed='0',
+            avg_wave_exposure='0',
+            top_site_labels='[]',
+            top_site_counts='[]',
+            profit_site_ids='[]',
+            profit_margins='[]')
+    
+    # Aggregate data by site_id (sorted); site attributes come from each
+    # site's first record
+    site_columns = dataset.aggregate(
+        'site_id',
+        **{field: (field, 'first') for field in SITE_FIELDS},
+        regulatory_zone=('regulatory_zone', 'first'),
+        cage_count=('site_id', 'count'),
+        total_profit_margin=('profit_margin', 'sum'),
+        record_count=('site_id', 'count'))
+    sites_list = column_rows(site_columns)
+    record_counts = site_columns['record_count']
     
     # Calculate regulatory zone distribution
-    zone_counts_dict = {}
-    for site in sites_list:
-        zone = site['regulatory_zone']
-        zone_counts_dict[zone] = zone_counts_dict.get(zone, 0) + 1
-    
-    zone_labels = sorted(zone_counts_dict.keys())
-    zone_counts = [zone_counts_dict[zone] for zone in zone_labels]
+    zone_labels, zone_counts = np.unique(site_columns['regulatory_zone'], return_counts=True)
+    zone_labels, zone_counts = zone_labels.tolist(), zone_counts.tolist()
     
     # Calculate species distribution
-    species_counts_dict = {}
-    for record in dataset:
-        species = record['species']
-        species_counts_dict[species] = species_counts_dict.get(species, 0) + 1
-    
-    species_labels = sorted(species_counts_dict.keys())
-    species_counts = [species_counts_dict[species] for species in species_labels]
+    species_labels, species_counts = dataset.value_counts('species')
     
     # Calculate average water conditions
-    avg_water_temp = sum(record['water_temp_c'] for record in dataset) / len(dataset)
-    avg_salinity = sum(record['salinity_psu'] for record in dataset) / len(dataset)
-    avg_water_depth = sum(record['water_depth_m'] for record in dataset) / len(dataset)
-    avg_current_speed = sum(record['avg_current_speed_m_s'] for record in dataset) / len(dataset)
-    avg_wave_exposure = sum(record['wave_exposure_index'] for record in dataset) / len(dataset)
+    avg_water_temp = dataset.mean('water_temp_c')
+    avg_salinity = dataset.mean('salinity_psu')
+    avg_water_depth = dataset.mean('water_depth_m')
+    avg_current_speed = dataset.mean('avg_current_speed_m_s')
+    avg_wave_exposure = dataset.mean('wave_exposure_index')
     
     # Get top 10 sites by cage count
-    top_sites = sorted(sites_list, key=lambda x: x['cage_count'], reverse=True)[:10]
+    top_sites = [sites_list[i] for i in np.argsort(-record_counts, kind='stable')[:10]]
     top_site_labels = [str(site['site_id']) for site in top_sites]
     top_site_counts = [site['cage_count'] for site in top_sites]
     
-    # Calculate average profit margin per site
-    profit_data = []
-    for site in sites_list:
-        avg_profit = site['total_profit_margin'] / site['record_count'] if site['record_count'] > 0 else 0
-        profit_data.append({
-            'site_id': site['site_id'],
-            'avg_profit': avg_profit
-        })
-    
-    # Sort by site_id and get first 20 for readability
-    profit_data_sorted = sorted(profit_data, key=lambda x: x['site_id'])[:20]
-    profit_site_ids = [str(p['site_id']) for p in profit_data_sorted]
-    profit_margins = [p['avg_profit'] for p in profit_data_sorted]
+    # Average profit margin of the first 20 sites (by site_id) for readability
+    profit_site_ids = [str(site_id) for site_id in site_columns['site_id'][:20].tolist()]
+    profit_margins = (site_columns['total_profit_margin'][:20] / record_counts[:20]).tolist()
     
     # Convert to JSON strings
-    import json
     zone_labels_json = json.dumps(zone_labels)
     zone_counts_json = json.dumps(zone_counts)
     species_labels_json = json.dumps(species_labels)
@@ -162,110 +163,70 @@ def sites():
     profit_site_ids_json = json.dumps(profit_site_ids)
     profit_margins_json = json.dumps(profit_margins)
     
-    return render_template('sites.html', 
-                         sites=sites_list,
-                         zone_labels=zone_labels_json,
-                         zone_counts=zone_counts_json,
-                         species_labels=species_labels_json,
-                         species_counts=species_counts_json,
-                         avg_water_temp=avg_water_temp,
-                         avg_salinity=avg_salinity,
-                         avg_water_depth=avg_water_depth,
-                         avg_current_speed=avg_current_speed,
-                         avg_wave_exposure=avg_wave_exposure,
-                         top_site_labels=top_site_labels_json,
-                         top_site_counts=top_site_counts_json,
-                         profit_site_ids=profit_site_ids_json,
-                         profit_margins=profit_margins_json)
+    return dict(
+        sites=sites_list,
+        zone_labels=zone_labels_json,
+        zone_counts=zone_counts_json,
+        species_labels=species_labels_json,
+        species_counts=species_counts_json,
+        avg_water_temp=avg_water_temp,
+        avg_salinity=avg_salinity,
+        avg_water_depth=avg_water_depth,
+        avg_current_speed=avg_current_speed,
+        avg_wave_exposure=avg_wave_exposure,
+        top_site_labels=top_site_labels_json,
+        top_site_counts=top_site_counts_json,
+        profit_site_ids=profit_site_ids_json,
+        profit_margins=profit_margins_json)
 
 @app.route('/species')
 def species():
+    return render_template('species.html', **cached_context('species', species_context))
+
+def species_context(dataset):
     if not dataset:
-        return render_template('species.html',
-                             species_data=[],
-                             avg_growth_rate=0,
-                             avg_survival_rate=0,
-                             best_fcr=0,
-                             species_labels='[]',
-                             growth_rates='[]',
-                             survival_rates='[]',
-                             fcr_values='[]',
-                             avg_weights='[]',
-                             disease_labels='[]',
-                             disease_counts='[]',
-                             avg_ages='[]')
+        return dict(
+            species_data=[],
+            avg_growth_rate=0,
+            avg_survival_rate=0,
+            best_fcr=0,
+            species_labels='[]',
+            growth_rates='[]',
+            survival_rates='[]',
+            fcr_values='[]',
+            avg_weights='[]',
+            disease_labels='[]',
+            disease_counts='[]',
+            avg_ages='[]')
     
     # Aggregate data by species
-    species_dict = {}
-    for record in dataset:
-        species = record['species']
-        if species not in species_dict:
-            species_dict[species] = {
-                'species': species,
-                'total_weight': 0,
-                'total_growth_rate': 0,
-                'total_survival_rate': 0,
-                'total_fcr': 0,
-                'total_age': 0,
-                'count': 0,
-                'health_score': 0
-            }
-        
-        species_dict[species]['total_weight'] += record['current_weight_g']
-        species_dict[species]['total_growth_rate'] += record['growth_rate_g_day']
-        species_dict[species]['total_survival_rate'] += record['survival_rate_pct']
-        species_dict[species]['total_fcr'] += record['feed_conversion_ratio']
-        species_dict[species]['total_age'] += record['age_days']
-        species_dict[species]['count'] += 1
-    
-    # Calculate averages
-    species_data = []
-    for species, data in sorted(species_dict.items()):
-        count = data['count']
-        avg_weight = data['total_weight'] / count
-        avg_growth = data['total_growth_rate'] / count
-        avg_survival = data['total_survival_rate'] / count
-        avg_fcr = data['total_fcr'] / count
-        avg_age = data['total_age'] / count
-        
-        # Simple health score based on survival rate and growth rate
-        health_score = avg_survival + avg_growth
-        
-        species_data.append({
-            'species': species,
-            'avg_weight': avg_weight,
-            'avg_growth_rate': avg_growth,
-            'avg_survival_rate': avg_survival,
-            'avg_fcr': avg_fcr,
-            'avg_age': avg_age,
-            'count': count,
-            'health_score': health_score
-        })
+    by_species = dataset.aggregate('species',
+                                   avg_weight=('current_weight_g', 'mean'),
+                                   avg_growth_rate=('growth_rate_g_day', 'mean'),
+                                   avg_survival_rate=('survival_rate_pct', 'mean'),
+                                   avg_fcr=('feed_conversion_ratio', 'mean'),
+                                   avg_age=('age_days', 'mean'),
+                                   count=('species', 'count'))
+    # Simple health score based on survival rate and growth rate
+    by_species['health_score'] = by_species['avg_survival_rate'] + by_species['avg_growth_rate']
+    species_data = column_rows(by_species)
+    
+    species_labels = by_species['species'].tolist()
+    avg_weights = by_species['avg_weight'].tolist()
+    growth_rates = by_species['avg_growth_rate'].tolist()
+    survival_rates = by_species['avg_survival_rate'].tolist()
+    fcr_values = by_species['avg_fcr'].tolist()
+    avg_ages = by_species['avg_age'].tolist()
     
     # Overall statistics
-    avg_growth_rate = sum(s['avg_growth_rate'] for s in species_data) / len(species_data) if species_data else 0
-    avg_survival_rate = sum(s['avg_survival_rate'] for s in species_data) / len(species_data) if species_data else 0
-    best_fcr = min(s['avg_fcr'] for s in species_data) if species_data else 0
-    
-    # Chart data
-    species_labels = [s['species'] for s in species_data]
-    growth_rates = [s['avg_growth_rate'] for s in species_data]
-    survival_rates = [s['avg_survival_rate'] for s in species_data]
-    fcr_values = [s['avg_fcr'] for s in species_data]
-    avg_weights = [s['avg_weight'] for s in species_data]
-    avg_ages = [s['avg_age'] for s in species_data]
+    avg_growth_rate = sum(growth_rates) / len(species_data) if species_data else 0
+    avg_survival_rate = sum(survival_rates) / len(species_data) if species_data else 0
+    best_fcr = min(fcr_values) if species_data else 0
     
     # Disease status distribution
-    disease_counts_dict = {}
-    for record in dataset:
-        status = record['disease_status']
-        disease_counts_dict[status] = disease_counts_dict.get(status, 0) + 1
-    
-    disease_labels = sorted(disease_counts_dict.keys())
-    disease_counts = [disease_counts_dict[label] for label in disease_labels]
+    disease_labels, disease_counts = dataset.value_counts('disease_status')
     
     # Convert to JSON
-    import json
     species_labels_json = json.dumps(species_labels)
     growth_rates_json = json.dumps(growth_rates)
     survival_rates_json = json.dumps(survival_rates)
@@ -275,287 +236,200 @@ def species():
     disease_counts_json = json.dumps(disease_counts)
     avg_ages_json = json.dumps(avg_ages)
     
-    return render_template('species.html',
-                         species_data=species_data,
-                         avg_growth_rate=avg_growth_rate,
-                         avg_survival_rate=avg_survival_rate,
-                         best_fcr=best_fcr,
-                         species_labels=species_labels_json,
-                         growth_rates=growth_rates_json,
-                         survival_rates=survival_rates_json,
-                         fcr_values=fcr_values_json,
-                         avg_weights=avg_weights_json,
-                         disease_labels=disease_labels_json,
-                         disease_counts=disease_counts_json,
-                         avg_ages=avg_ages_json) 
+    return dict(
+        species_data=species_data,
+        avg_growth_rate=avg_growth_rate,
+        avg_survival_rate=avg_survival_rate,
+        best_fcr=best_fcr,
+        species_labels=species_labels_json,
+        growth_rates=growth_rates_json,
+        survival_rates=survival_rates_json,
+        fcr_values=fcr_values_json,
+        avg_weights=avg_weights_json,
+        disease_labels=disease_labels_json,
+        disease_counts=disease_counts_json,
+        avg_ages=avg_ages_json)
 
 @app.route('/water-quality')
 def water_quality():
+    return render_template('water-quality.html', **cached_context('water_quality', water_quality_context))
+
+def water_quality_context(dataset):
     if not dataset:
-        return render_template('water-quality.html',
-                             avg_temp=0, avg_salinity=0, avg_oxygen=0, avg_turbidity=0,
-                             avg_ammonia=0, avg_nitrate=0,
-                             temperature_data='[]', salinity_data='[]', oxygen_data='[]',
-                             ammonia_data='[]', nitrate_data='[]', turbidity_data='[]',
-                             chlorophyll_data='[]', site_ids='[]',
-                             zone_labels='[]', zone_temps='[]', zone_oxygen='[]', zone_salinity='[]',
-                             water_quality_data=[],
-                             low_oxygen_count=0, high_ammonia_count=0, optimal_count=0)
+        return dict(
+            avg_temp=0, avg_salinity=0, avg_oxygen=0, avg_turbidity=0,
+            avg_ammonia=0, avg_nitrate=0,
+            temperature_data='[]', salinity_data='[]', oxygen_data='[]',
+            ammonia_data='[]', nitrate_data='[]', turbidity_data='[]',
+            chlorophyll_data='[]', site_ids='[]',
+            zone_labels='[]', zone_temps='[]', zone_oxygen='[]', zone_salinity='[]',
+            water_quality_data=[],
+            low_oxygen_count=0, high_ammonia_count=0, optimal_count=0)
     
     # Overall averages
-    avg_temp = sum(r['water_temp_c'] for r in dataset) / len(dataset)
-    avg_salinity = sum(r['salinity_psu'] for r in dataset) / len(dataset)
-    avg_oxygen = sum(r['dissolved_oxygen_mg_l'] for r in dataset) / len(dataset)
-    avg_turbidity = sum(r['turbidity_ntu'] for r in dataset) / len(dataset)
-    avg_ammonia = sum(r['ammonia_mg_l'] for r in dataset) / len(dataset)
-    avg_nitrate = sum(r['nitrate_mg_l'] for r in dataset) / len(dataset)
-    
-    # Collect all values for distribution charts
-    temperature_data = [r['water_temp_c'] for r in dataset]
-    salinity_data = [r['salinity_psu'] for r in dataset]
-    oxygen_data = [r['dissolved_oxygen_mg_l'] for r in dataset]
+    avg_temp = dataset.mean('water_temp_c')
+    avg_salinity = dataset.mean('salinity_psu')
+    avg_oxygen = dataset.mean('dissolved_oxygen_mg_l')
+    avg_turbidity = dataset.mean('turbidity_ntu')
+    avg_ammonia = dataset.mean('ammonia_mg_l')
+    avg_nitrate = dataset.mean('nitrate_mg_l')
     
     # Aggregate by site for detailed table
-    site_water_quality = {}
-    for record in dataset:
-        site_id = record['site_id']
-        if site_id not in site_water_quality:
-            site_water_quality[site_id] = {
-                'site_id': site_id,
-                'total_temp': 0,
-                'total_salinity': 0,
-                'total_oxygen': 0,
-                'total_ammonia': 0,
-                'total_nitrate': 0,
-                'total_turbidity': 0,
-                'total_chlorophyll': 0,
-                'count': 0
-            }
-        
-        site_water_quality[site_id]['total_temp'] += record['water_temp_c']
-        site_water_quality[site_id]['total_salinity'] += record['salinity_psu']
-        site_water_quality[site_id]['total_oxygen'] += record['dissolved_oxygen_mg_l']
-        site_water_quality[site_id]['total_ammonia'] += record['ammonia_mg_l']
-        site_water_quality[site_id]['total_nitrate'] += record['nitrate_mg_l']
-        site_water_quality[site_id]['total_turbidity'] += record['turbidity_ntu']
-        site_water_quality[site_id]['total_chlorophyll'] += record['chlorophyll_index']
-        site_water_quality[site_id]['count'] += 1
-    
-    # Calculate averages and quality scores
-    water_quality_data = []
-    for site_id, data in sorted(site_water_quality.items()):
-        count = data['count']
-        avg_site_oxygen = data['total_oxygen'] / count
-        avg_site_ammonia = data['total_ammonia'] / count
-        
-        # Simple quality score based on oxygen and ammonia
-        quality_score = avg_site_oxygen - avg_site_ammonia
-        
-        water_quality_data.append({
-            'site_id': site_id,
-            'avg_temp': data['total_temp'] / count,
-            'avg_salinity': data['total_salinity'] / count,
-            'avg_oxygen': avg_site_oxygen,
-            'avg_ammonia': avg_site_ammonia,
-            'avg_nitrate': data['total_nitrate'] / count,
-            'avg_turbidity': data['total_turbidity'] / count,
-            'avg_chlorophyll': data['total_chlorophyll'] / count,
-            'quality_score': quality_score
-        })
+    site_columns = dataset.aggregate('site_id',
+                                     avg_temp=('water_temp_c', 'mean'),
+                                     avg_salinity=('salinity_psu', 'mean'),
+                                     avg_oxygen=('dissolved_oxygen_mg_l', 'mean'),
+                                     avg_ammonia=('ammonia_mg_l', 'mean'),
+                                     avg_nitrate=('nitrate_mg_l', 'mean'),
+                                     avg_turbidity=('turbidity_ntu', 'mean'),
+                                     avg_chlorophyll=('chlorophyll_index', 'mean'))
+    site_oxygen = site_columns['avg_oxygen']
+    site_ammonia = site_columns['avg_ammonia']
+    # Simple quality score based on oxygen and ammonia
+    quality_scores = site_columns['quality_score'] = site_oxygen - site_ammonia
+    water_quality_data = column_rows(site_columns)
     
     # Get data for charts (first 20 sites)
-    site_ids = [str(w['site_id']) for w in water_quality_data[:20]]
-    ammonia_data = [w['avg_ammonia'] for w in water_quality_data[:20]]
-    nitrate_data = [w['avg_nitrate'] for w in water_quality_data[:20]]
-    turbidity_data = [w['avg_turbidity'] for w in water_quality_data[:15]]
-    chlorophyll_data = [w['avg_chlorophyll'] for w in water_quality_data[:15]]
+    site_ids_chart = [str(site_id) for site_id in site_columns['site_id'][:20].tolist()]
+    ammonia_data = site_ammonia[:20].tolist()
+    nitrate_data = site_columns['avg_nitrate'][:20].tolist()
+    turbidity_data = site_columns['avg_turbidity'][:15].tolist()
+    chlorophyll_data = site_columns['avg_chlorophyll'][:15].tolist()
     
     # Aggregate by regulatory zone
-    zone_water_quality = {}
-    for record in dataset:
-        zone = record['regulatory_zone']
-        if zone not in zone_water_quality:
-            zone_water_quality[zone] = {
-                'total_temp': 0,
-                'total_oxygen': 0,
-                'total_salinity': 0,
-                'count': 0
-            }
-        
-        zone_water_quality[zone]['total_temp'] += record['water_temp_c']
-        zone_water_quality[zone]['total_oxygen'] += record['dissolved_oxygen_mg_l']
-        zone_water_quality[zone]['total_salinity'] += record['salinity_psu']
-        zone_water_quality[zone]['count'] += 1
-    
-    zone_labels = sorted(zone_water_quality.keys())
-    zone_temps = [zone_water_quality[z]['total_temp'] / zone_water_quality[z]['count'] for z in zone_labels]
-    zone_oxygen = [zone_water_quality[z]['total_oxygen'] / zone_water_quality[z]['count'] for z in zone_labels]
-    zone_salinity = [zone_water_quality[z]['total_salinity'] / zone_water_quality[z]['count'] for z in zone_labels]
+    by_zone = dataset.aggregate('regulatory_zone',
+                                temp=('water_temp_c', 'mean'),
+                                oxygen=('dissolved_oxygen_mg_l', 'mean'),
+                                salinity=('salinity_psu', 'mean'))
+    zone_labels = by_zone['regulatory_zone']
+    zone_temps = by_zone['temp'].tolist()
+    zone_oxygen = by_zone['oxygen'].tolist()
+    zone_salinity = by_zone['salinity'].tolist()
     
     # Calculate alerts
-    low_oxygen_count = sum(1 for w in water_quality_data if w['avg_oxygen'] < avg_oxygen)
-    high_ammonia_count = sum(1 for w in water_quality_data if w['avg_ammonia'] > avg_ammonia)
-    optimal_count = sum(1 for w in water_quality_data if w['quality_score'] > 0.1)
-    
-    # Convert to JSON
-    import json
-    temperature_data_json = json.dumps(temperature_data[:100])  # Limit for performance
-    salinity_data_json = json.dumps(salinity_data[:100])
-    oxygen_data_json = json.dumps(oxygen_data[:100])
+    low_oxygen_count = int(np.count_nonzero(site_oxygen < avg_oxygen))
+    high_ammonia_count = int(np.count_nonzero(site_ammonia > avg_ammonia))
+    optimal_count = int(np.count_nonzero(quality_scores > 0.1))
+    
+    # Convert to JSON (distribution charts are limited for performance)
+    temperature_data_json = json.dumps(dataset['water_temp_c'][:100].tolist())
+    salinity_data_json = json.dumps(dataset['salinity_psu'][:100].tolist())
+    oxygen_data_json = json.dumps(dataset['dissolved_oxygen_mg_l'][:100].tolist())
     ammonia_data_json = json.dumps(ammonia_data)
     nitrate_data_json = json.dumps(nitrate_data)
     turbidity_data_json = json.dumps(turbidity_data)
     chlorophyll_data_json = json.dumps(chlorophyll_data)
-    site_ids_json = json.dumps(site_ids)
-    zone_labels_json = json.dumps(zone_labels)
+    site_ids_json = json.dumps(site_ids_chart)
+    zone_labels_json = json.dumps(zone_labels.tolist())
     zone_temps_json = json.dumps(zone_temps)
     zone_oxygen_json = json.dumps(zone_oxygen)
     zone_salinity_json = json.dumps(zone_salinity)
     
-    return render_template('water-quality.html',
-                         avg_temp=avg_temp,
-                         avg_salinity=avg_salinity,
-                         avg_oxygen=avg_oxygen,
-                         avg_turbidity=avg_turbidity,
-                         avg_ammonia=avg_ammonia,
-                         avg_nitrate=avg_nitrate,
-                         temperature_data=temperature_data_json,
-                         salinity_data=salinity_data_json,
-                         oxygen_data=oxygen_data_json,
-                         ammonia_data=ammonia_data_json,
-                         nitrate_data=nitrate_data_json,
-                         turbidity_data=turbidity_data_json,
-                         chlorophyll_data=chlorophyll_data_json,
-                         site_ids=site_ids_json,
-                         zone_labels=zone_labels_json,
-                         zone_temps=zone_temps_json,
-                         zone_oxygen=zone_oxygen_json,
-                         zone_salinity=zone_salinity_json,
-                         water_quality_data=water_quality_data,
-                         low_oxygen_count=low_oxygen_count,
-                         high_ammonia_count=high_ammonia_count,
-                         optimal_count=optimal_count)
+    return dict(
+        avg_temp=avg_temp,
+        avg_salinity=avg_salinity,
+        avg_oxygen=avg_oxygen,
+        avg_turbidity=avg_turbidity,
+        avg_ammonia=avg_ammonia,
+        avg_nitrate=avg_nitrate,
+        temperature_data=temperature_data_json,
+        salinity_data=salinity_data_json,
+        oxygen_data=oxygen_data_json,
+        ammonia_data=ammonia_data_json,
+        nitrate_data=nitrate_data_json,
+        turbidity_data=turbidity_data_json,
+        chlorophyll_data=chlorophyll_data_json,
+        site_ids=site_ids_json,
+        zone_labels=zone_labels_json,
+        zone_temps=zone_temps_json,
+        zone_oxygen=zone_oxygen_json,
+        zone_salinity=zone_salinity_json,
+        water_quality_data=water_quality_data,
+        low_oxygen_count=low_oxygen_count,
+        high_ammonia_count=high_ammonia_count,
+        optimal_count=optimal_count)
 
 @app.route('/analytics')
 def analytics():
+    return render_template('analytics.html', **cached_context('analytics', analytics_context))
+
+def analytics_context(dataset):
     if not dataset:
-        return render_template('analytics.html',
-                             total_revenue=0, avg_profit_margin=0, total_harvest=0, avg_market_price=0,
-                             site_labels='[]', revenue_data='[]', cost_data='[]',
-                             profit_margins='[]', species_labels='[]', harvest_by_species='[]',
-                             price_site_labels='[]', market_prices='[]',
-                             stocking_density='[]', density_profit='[]',
-                             labor_hours='[]', energy_kwh='[]', efficiency_sites='[]',
-                             avg_mortality='[]', avg_treatment='[]',
-                             cage_volumes='[]', volume_labels='[]',
-                             correlation_data='[]',
-                             top_performers=[],
-                             best_species='', best_species_profit=0,
-                             improvement_sites=0, high_performers=0)
+        return dict(
+            total_revenue=0, avg_profit_margin=0, total_harvest=0, avg_market_price=0,
+            site_labels='[]', revenue_data='[]', cost_data='[]',
+            profit_margins='[]', species_labels='[]', harvest_by_species='[]',
+            price_site_labels='[]', market_prices='[]',
+            stocking_density='[]', density_profit='[]',
+            labor_hours='[]', energy_kwh='[]', efficiency_sites='[]',
+            avg_mortality='[]', avg_treatment='[]',
+            cage_volumes='[]', volume_labels='[]',
+            correlation_data='[]',
+            top_performers=[],
+            best_species='', best_species_profit=0,
+            improvement_sites=0, high_performers=0)
     
     # Overall KPIs
-    total_revenue = sum(r['revenue'] for r in dataset)
-    total_cost = sum(r['cost'] for r in dataset)
-    avg_profit_margin = (sum(r['profit_margin'] for r in dataset) / len(dataset)) * 100
-    total_harvest = sum(r['harvest_weight_kg'] for r in dataset)
-    avg_market_price = sum(r['market_price_per_kg'] for r in dataset) / len(dataset)
-    
-    # Aggregate by site for financial analysis
-    site_financials = {}
-    for record in dataset:
-        site_id = record['site_id']
-        if site_id not in site_financials:
-            site_financials[site_id] = {
-                'site_id': site_id,
-                'species': record['species'],
-                'total_revenue': 0,
-                'total_cost': 0,
-                'total_profit_margin': 0,
-                'total_harvest': 0,
-                'total_growth_rate': 0,
-                'total_survival_rate': 0,
-                'count': 0
-            }
-        
-        site_financials[site_id]['total_revenue'] += record['revenue']
-        site_financials[site_id]['total_cost'] += record['cost']
-        site_financials[site_id]['total_profit_margin'] += record['profit_margin']
-        site_financials[site_id]['total_harvest'] += record['harvest_weight_kg']
-        site_financials[site_id]['total_growth_rate'] += record['growth_rate_g_day']
-        site_financials[site_id]['total_survival_rate'] += record['survival_rate_pct']
-        site_financials[site_id]['count'] += 1
-    
-    # Top performers
-    top_performers = []
-    for site_id, data in site_financials.items():
-        count = data['count']
-        top_performers.append({
-            'site_id': site_id,
-            'species': data['species'],
-            'revenue': data['total_revenue'] / count,
-            'cost': data['total_cost'] / count,
-            'profit_margin': (data['total_profit_margin'] / count) * 100,
-            'harvest_weight': data['total_harvest'] / count,
-            'growth_rate': data['total_growth_rate'] / count,
-            'survival_rate': data['total_survival_rate'] / count
-        })
-    
-    top_performers = sorted(top_performers, key=lambda x: x['profit_margin'], reverse=True)[:10]
+    total_revenue = dataset.sum('revenue')
+    total_cost = dataset.sum('cost')
+    avg_profit_margin = dataset.mean('profit_margin') * 100
+    total_harvest = dataset.sum('harvest_weight_kg')
+    avg_market_price = dataset.mean('market_price_per_kg')
+    
+    # Aggregate by site for financial analysis: every per-site figure the
+    # page shows comes from this one grouped pass
+    by_site = dataset.aggregate('site_id',
+                                species=('species', 'first'),
+                                revenue=('revenue', 'mean'),
+                                cost=('cost', 'mean'),
+                                profit_margin=('profit_margin', 'mean'),
+                                harvest_weight=('harvest_weight_kg', 'mean'),
+                                growth_rate=('growth_rate_g_day', 'mean'),
+                                survival_rate=('survival_rate_pct', 'mean'))
+    site_extras = dataset.aggregate('site_id',
+                                    market_price=('market_price_per_kg', 'mean'),
+                                    labor_hours=('labor_hours_day', 'mean'),
+                                    energy_kwh=('energy_kwh_day', 'mean'))
+    by_site['profit_margin'] = by_site['profit_margin'] * 100
+    
+    # Top performers (ties keep the order in which sites first appear)
+    appearance = np.argsort(dataset.index('site_id').first, kind='stable')
+    top = appearance[np.argsort(-by_site['profit_margin'][appearance], kind='stable')[:10]]
+    top_performers = column_rows(by_site, top)
     
     # Revenue vs Cost data (first 15 sites)
     site_labels = [str(s['site_id']) for s in top_performers[:15]]
     revenue_data = [s['revenue'] for s in top_performers[:15]]
     cost_data = [s['cost'] for s in top_performers[:15]]
     
-    # Profit margin distribution
-    profit_margins = [r['profit_margin'] for r in dataset]
-    
-    # Harvest by species
-    species_harvest = {}
-    for record in dataset:
-        species = record['species']
-        if species not in species_harvest:
-            species_harvest[species] = 0
-        species_harvest[species] += record['harvest_weight_kg']
-    
-    species_labels = sorted(species_harvest.keys())
-    harvest_by_species = [species_harvest[s] for s in species_labels]
+    # Harvest, mortality, treatment and profit by species
+    by_species = dataset.aggregate('species',
+                                   harvest=('harvest_weight_kg', 'sum'),
+                                   mortality=('mortality_events', 'mean'),
+                                   treatment=('treatment_events', 'mean'),
+                                   profit_margin=('profit_margin', 'mean'))
+    species_labels = by_species['species'].tolist()
+    harvest_by_species = by_species['harvest'].tolist()
     
     # Market price trends
     price_site_labels = [str(s['site_id']) for s in top_performers[:15]]
-    market_prices = [sum(r['market_price_per_kg'] for r in dataset if r['site_id'] == s['site_id']) / 
-                     sum(1 for r in dataset if r['site_id'] == s['site_id']) 
-                     for s in top_performers[:15]]
+    market_prices = site_extras['market_price'][top[:15]].tolist()
     
     # Stocking density vs profit
-    stocking_density = [r['stocking_density_kg_m3'] for r in dataset[:50]]
-    density_profit = [r['profit_margin'] for r in dataset[:50]]
+    stocking_density = dataset['stocking_density_kg_m3'][:50].tolist()
+    density_profit = dataset['profit_margin'][:50].tolist()
     
     # Labor & Energy efficiency
     efficiency_sites = site_labels[:10]
-    labor_hours = [sum(r['labor_hours_day'] for r in dataset if r['site_id'] == int(s)) / 
-                   sum(1 for r in dataset if r['site_id'] == int(s)) 
-                   for s in efficiency_sites]
-    energy_kwh = [sum(r['energy_kwh_day'] for r in dataset if r['site_id'] == int(s)) / 
-                  sum(1 for r in dataset if r['site_id'] == int(s)) 
-                  for s in efficiency_sites]
+    labor_hours = site_extras['labor_hours'][top[:10]].tolist()
+    energy_kwh = site_extras['energy_kwh'][top[:10]].tolist()
     
     # Mortality & Treatment by species
-    species_events = {}
-    for record in dataset:
-        species = record['species']
-        if species not in species_events:
-            species_events[species] = {'mortality': 0, 'treatment': 0, 'count': 0}
-        species_events[species]['mortality'] += record['mortality_events']
-        species_events[species]['treatment'] += record['treatment_events']
-        species_events[species]['count'] += 1
-    
-    avg_mortality = [species_events[s]['mortality'] / species_events[s]['count'] for s in species_labels]
-    avg_treatment = [species_events[s]['treatment'] / species_events[s]['count'] for s in species_labels]
+    avg_mortality = by_species['mortality'].tolist()
+    avg_treatment = by_species['treatment'].tolist()
     
     # Cage volume utilization (top 7 volume ranges)
-    cage_volumes_data = [r['cage_volume_m3'] for r in dataset]
-    volume_bins = createBins(cage_volumes_data, 7)
+    volume_bins = createBins(dataset['cage_volume_m3'], 7)
     cage_volumes = volume_bins['counts']
     volume_labels = volume_bins['labels']
     
@@ -570,11 +444,7 @@ def analytics():
     ]
     
     # Insights
-    best_species_data = {}
-    for species in species_labels:
-        species_records = [r for r in dataset if r['species'] == species]
-        avg_profit = sum(r['profit_margin'] for r in species_records) / len(species_records)
-        best_species_data[species] = avg_profit
+    best_species_data = dict(zip(species_labels, by_species['profit_margin'].tolist()))
     
     best_species = max(best_species_data, key=best_species_data.get) if best_species_data else ''
     best_species_profit = best_species_data[best_species] * 100 if best_species else 0
@@ -583,11 +453,10 @@ def analytics():
     high_performers = sum(1 for p in top_performers if p['profit_margin'] > avg_profit_margin * 1.2)
     
     # Convert to JSON
-    import json
     site_labels_json = json.dumps(site_labels)
     revenue_data_json = json.dumps(revenue_data)
     cost_data_json = json.dumps(cost_data)
-    profit_margins_json = json.dumps(profit_margins[:100])
+    profit_margins_json = json.dumps(dataset['profit_margin'][:100].tolist())
     species_labels_json = json.dumps(species_labels)
     harvest_by_species_json = json.dumps(harvest_by_species)
     price_site_labels_json = json.dumps(price_site_labels)
@@ -603,94 +472,124 @@ def analytics():
     volume_labels_json = json.dumps(volume_labels)
     correlation_data_json = json.dumps(correlation_data)
     
-    return render_template('analytics.html',
-                         total_revenue=total_revenue,
-                         avg_profit_margin=avg_profit_margin,
-                         total_harvest=total_harvest,
-                         avg_market_price=avg_market_price,
-                         site_labels=site_labels_json,
-                         revenue_data=revenue_data_json,
-                         cost_data=cost_data_json,
-                         profit_margins=profit_margins_json,
-                         species_labels=species_labels_json,
-                         harvest_by_species=harvest_by_species_json,
-                         price_site_labels=price_site_labels_json,
-                         market_prices=market_prices_json,
-                         stocking_density=stocking_density_json,
-                         density_profit=density_profit_json,
-                         labor_hours=labor_hours_json,
-                         energy_kwh=energy_kwh_json,
-                         efficiency_sites=efficiency_sites_json,
-                         avg_mortality=avg_mortality_json,
-                         avg_treatment=avg_treatment_json,
-                         cage_volumes=cage_volumes_json,
-                         volume_labels=volume_labels_json,
-                         correlation_data=correlation_data_json,
-                         top_performers=top_performers,
-                         best_species=best_species,
-                         best_species_profit=best_species_profit,
-                         improvement_sites=improvement_sites,
-                         high_performers=high_performers)
+    return dict(
+        total_revenue=total_revenue,
+        avg_profit_margin=avg_profit_margin,
+        total_harvest=total_harvest,
+        avg_market_price=avg_market_price,
+        site_labels=site_labels_json,
+        revenue_data=revenue_data_json,
+        cost_data=cost_data_json,
+        profit_margins=profit_margins_json,
+        species_labels=species_labels_json,
+        harvest_by_species=harvest_by_species_json,
+        price_site_labels=price_site_labels_json,
+        market_prices=market_prices_json,
+        stocking_density=stocking_density_json,
+        density_profit=density_profit_json,
+        labor_hours=labor_hours_json,
+        energy_kwh=energy_kwh_json,
+        efficiency_sites=efficiency_sites_json,
+        avg_mortality=avg_mortality_json,
+        avg_treatment=avg_treatment_json,
+        cage_volumes=cage_volumes_json,
+        volume_labels=volume_labels_json,
+        correlation_data=correlation_data_json,
+        top_performers=top_performers,
+        best_species=best_species,
+        best_species_profit=best_species_profit,
+        improvement_sites=improvement_sites,
+        high_performers=high_performers)
 
 def createBins(data, numBins):
     """Helper function to create bins for data distribution"""
-    if not data:
+    data = np.asarray(data, dtype=np.float64)
+    if not data.size:
         return {'counts': [], 'labels': []}
     
-    min_val = min(data)
-    max_val = max(data)
+    min_val = float(data.min())
+    max_val = float(data.max())
     bin_width = (max_val - min_val) / numBins
     
-    bins = []
-    labels = []
+    # [bin_start, bin_end) counts read off one sorted copy of the data
+    sorted_data = np.sort(data)
+    starts = [min_val + (i * bin_width) for i in range(numBins)]
+    ends = [bin_start + bin_width for bin_start in starts]
+    counts = np.searchsorted(sorted_data, ends) - np.searchsorted(sorted_data, starts)
+    labels = [f'{bin_start:.1f}-{bin_end:.1f}' for bin_start, bin_end in zip(starts, ends)]
     
-    for i in range(numBins):
-        bin_start = min_val + (i * bin_width)
-        bin_end = bin_start + bin_width
-        count = sum(1 for val in data if bin_start <= val < bin_end)
-        
-        bins.append(count)
-        labels.append(f'{bin_start:.1f}-{bin_end:.1f}')
+    return {'counts': counts.tolist(), 'labels': labels}
+
+def load_regression_results(path):
+    """Regression results file with fitted values, actuals and residuals
+    as arrays"""
+    with open(path, 'r') as f:
+        results = json.load(f)
+    observations = results.get('observations', [])
+    fitted = np.array([obs['fitted'] for obs in observations], dtype=np.float64)
+    actual = np.array([obs['actual'] for obs in observations], dtype=np.float64)
+    return {'results': results, 'fitted': fitted, 'actual': actual, 'residuals': actual - fitted}
+
+def load_monte_carlo_results(path):
+    """Load Monte Carlo results with scenarios as column arrays from the
+    binary .npz export or the JSON one, and serialize the chart data once"""
+    if path.endswith('.npz'):
+        mc_results = read_results_npz(path, include_paths=False)
+    else:
+        with open(path, 'r') as f:
+            mc_results = json.load(f)
+        rows = mc_results['scenarios']
+        mc_results['scenarios'] = {key: np.array([row[key] for row in rows])
+                                   for key in (rows[0] if rows else {})}
+        # JSON exports carry no index; build it once here as the .npz writer does
+        if rows:
+            mc_results['scenario_index'] = ScenarioIndex.build(mc_results['scenarios'])
     
-    return {'counts': bins, 'labels': labels}
+    scenarios = mc_results['scenarios']
+    fan_charts = fan_charts_to_json(mc_results.get('fan_charts'))
+    if not len(scenarios.get('profit', [])):
+        # streaming runs keep no scenarios; their summary and fan charts still render
+        mc_results['charts'] = {key: '[]' for key in ('profit_data', 'roi_data', 'survival_data',
+                                                      'mortality_events', 'sorted_profits')}
+        mc_results['charts'].update({'percentile_data': {}, 'fan_charts': fan_charts})
+        return mc_results
+    
+    # Calculate additional percentiles for ROI (one sort for all of them)
+    roi_metrics = risk_metrics(scenarios['roi'], percentiles=(1, 5, 10, 25, 75, 90),
+                               confidence_levels=(), thresholds=())
+    percentile_data = {f'roi_{key}': roi_metrics[key] for key in ('p01', 'p05', 'p10', 'p25', 'p75', 'p90')}
+    percentile_data['roi_max'] = roi_metrics['max']
+    
+    # Chart data as JSON; sorted profits for the CDF come from the index
+    mc_results['charts'] = {
+        'profit_data': json.dumps(scenarios['profit'].tolist()),
+        'roi_data': json.dumps(scenarios['roi'].tolist()),
+        'survival_data': json.dumps(scenarios['survival_rate'].tolist()),
+        'mortality_events': json.dumps(scenarios['n_mortality_events'].tolist()),
+        'sorted_profits': json.dumps(mc_results['scenario_index'].sorted_profit.tolist()),
+        'percentile_data': percentile_data,
+        'fan_charts': fan_charts
+    }
+    return mc_results
+
+def artifact_paths(filename, extensions=('.json',), directories=('models/', '../models/', 'data/', '../data/')):
+    """Candidate locations of a result file, earlier extensions preferred"""
+    return [directory + filename + extension for extension in extensions for directory in directories]
+
+# Result files parsed once, reloaded only when their mtime or size changes
+artifacts = ArtifactLoader()
+artifacts.register('ols', artifact_paths('ols_results'), load_regression_results)
+artifacts.register('glsar', artifact_paths('glsar_results'), load_regression_results)
+artifacts.register('monte_carlo', artifact_paths('monte_carlo_results', extensions=('.npz', '.json')),
+                   load_monte_carlo_results)
 
 @app.route('/model-results')
 def model_results():
     """Display OLS and GLSAR regression model results"""
-    import json as json_module
-    import os
-    
-    # Try to load OLS results
-    ols_path_options = [
-        'models/ols_results.json',
-        '../models/ols_results.json',
-        'data/ols_results.json',
-        '../data/ols_results.json'
-    ]
-    
-    ols_results = None
-    for path in ols_path_options:
-        if os.path.exists(path):
-            with open(path, 'r') as f:
-                ols_results = json_module.load(f)
-            break
-    
-    # Try to load GLSAR results
-    glsar_path_options = [
-        'models/glsar_results.json',
-        '../models/glsar_results.json',
-        'data/glsar_results.json',
-        '../data/glsar_results.json'
-    ]
+    ols = artifacts.get('ols')
+    glsar = artifacts.get('glsar')
     
-    glsar_results = None
-    for path in glsar_path_options:
-        if os.path.exists(path):
-            with open(path, 'r') as f:
-                glsar_results = json_module.load(f)
-            break
-    
-    if not ols_results or not glsar_results:
+    if not ols or not ols['results'] or not glsar or not glsar['results']:
         return render_template('model-results.html',
                              ols_results={'r_squared': 0, 'adj_r_squared': 0, 'aic': 0, 'f_statistic': 0, 'n_observations': 0},
                              glsar_results={'rsquared': 0, 'ar_order': 0, 'aic': 0, 'bic': 0, 'n_observations': 0},
@@ -701,6 +600,9 @@ def model_results():
                              all_vars='[]', all_ols_coefs='[]', all_glsar_coefs='[]',
                              significant_count=0)
     
+    ols_results = ols['results']
+    glsar_results = glsar['results']
+    
     # Extract coefficients and p-values
     ols_coefficients = ols_results['coefficients']
     ols_pvalues = ols_results['p_values']
@@ -717,18 +619,14 @@ def model_results():
     ols_top_coefs = [v[1] for v in top_10]
     ols_top_pvals = [v[2] for v in top_10]
     
-    # Extract fitted vs actual data (first 100 observations)
-    ols_observations = ols_results.get('observations', [])[:100]
-    ols_fitted = [obs['fitted'] for obs in ols_observations]
-    ols_actual = [obs['actual'] for obs in ols_observations]
-    
-    glsar_observations = glsar_results.get('observations', [])[:100]
-    glsar_fitted = [obs['fitted'] for obs in glsar_observations]
-    glsar_actual = [obs['actual'] for obs in glsar_observations]
-    
-    # Calculate residuals
-    ols_residuals = [ols_actual[i] - ols_fitted[i] for i in range(len(ols_fitted))]
-    glsar_residuals = [glsar_actual[i] - glsar_fitted[i] for i in range(len(glsar_fitted))]
+    # Fitted vs actual and residuals (first 100 observations), precomputed
+    # when the files were loaded
+    ols_fitted = ols['fitted'][:100].tolist()
+    ols_actual = ols['actual'][:100].tolist()
+    ols_residuals = ols['residuals'][:100].tolist()
+    glsar_fitted = glsar['fitted'][:100].tolist()
+    glsar_actual = glsar['actual'][:100].tolist()
+    glsar_residuals = glsar['residuals'][:100].tolist()
     
     # All coefficients for comparison
     all_vars = list(ols_coefficients.keys())
@@ -784,28 +682,33 @@ def model_results():
                          all_glsar_coefs=all_glsar_coefs_json,
                          significant_count=significant_count)
 
+def scenario_rows(scenarios, indices):
+    """Rebuild per-scenario dicts for the given row indices of column arrays"""
+    return [{key: values[i].item() for key, values in scenarios.items()} for i in indices]
+
+def fan_charts_to_json(fan_charts):
+    """Per-timestep quantile bands (arrays from .npz, lists from JSON) as a
+    JSON string for the fan chart canvases, or None when the run had none"""
+    if not fan_charts:
+        return None
+    def plain(value):
+        return value.tolist() if isinstance(value, np.ndarray) else value
+    return json.dumps({kind: ({stat: plain(band) for stat, band in chart.items()}
+                              if isinstance(chart, dict) else plain(chart))
+                       for kind, chart in fan_charts.items()})
+
+@app.template_filter('number_format')
+def number_format(value):
+    """Custom filter for number formatting"""
+    return f"{value:,}"
+
 @app.route('/risk-analytics')
 def risk_analytics():
-    """Display Monte Carlo simulation risk analytics"""
-    import json as json_module
-    import os
-    
-    # Try to load Monte Carlo results
-    mc_path_options = [
-        'models/monte_carlo_results.json',
-        '../models/monte_carlo_results.json',
-        'data/monte_carlo_results.json',
-        '../data/monte_carlo_results.json'
-    ]
-    
-    mc_results = None
-    for path in mc_path_options:
-        if os.path.exists(path):
-            with open(path, 'r') as f:
-                mc_results = json_module.load(f)
-            break
+    """Display Monte Carlo simulation risk analytics; ?species= and
+    ?site_id= narrow the best/worst scenario tables"""
+    mc_results = artifacts.get('monte_carlo')
     
-    if not mc_results:
+    if not mc_results or not mc_results['summary_statistics']:
         return render_template('risk-analytics.html',
                              metadata={'n_simulations': 0, 'time_horizon_days': 0, 'generated_at': 'N/A'},
                              stats={},
@@ -816,63 +719,37 @@ def risk_analytics():
                              sorted_profits='[]',
                              percentile_data={},
                              best_scenarios=[],
-                             worst_scenarios=[])
+                             worst_scenarios=[],
+                             fan_charts=None)
     
     # Extract metadata and statistics
     metadata = mc_results['metadata']
     stats = mc_results['summary_statistics']
     scenarios = mc_results['scenarios']
     
-    # Extract data arrays for charts
-    profit_data = [s['profit'] for s in scenarios]
-    roi_data = [s['roi'] for s in scenarios]
-    survival_data = [s['survival_rate'] for s in scenarios]
-    mortality_events = [s['n_mortality_events'] for s in scenarios]
-    
-    # Sorted profits for CDF
-    sorted_profits = sorted(profit_data)
-    
-    # Calculate additional percentiles for ROI
-    roi_array = np.array(roi_data)
-    percentile_data = {
-        'roi_p01': float(np.percentile(roi_array, 1)),
-        'roi_p05': float(np.percentile(roi_array, 5)),
-        'roi_p10': float(np.percentile(roi_array, 10)),
-        'roi_p25': float(np.percentile(roi_array, 25)),
-        'roi_p75': float(np.percentile(roi_array, 75)),
-        'roi_p90': float(np.percentile(roi_array, 90)),
-        'roi_max': float(np.max(roi_array))
-    }
-    
-    # Get best and worst scenarios
-    scenarios_sorted = sorted(scenarios, key=lambda x: x['profit'], reverse=True)
-    best_scenarios = scenarios_sorted[:10]
-    worst_scenarios = scenarios_sorted[-10:][::-1]  # Reverse to show worst first
-    
-    # Convert to JSON for charts
-    profit_data_json = json.dumps(profit_data)
-    roi_data_json = json.dumps(roi_data)
-    survival_data_json = json.dumps(survival_data)
-    mortality_events_json = json.dumps(mortality_events)
-    sorted_profits_json = json.dumps(sorted_profits)
-    
-    # Custom filter for number formatting
-    def number_format(value):
-        return f"{value:,}"
+    # Chart data serialized when the results were loaded
+    charts = mc_results['charts']
     
-    app.jinja_env.filters['number_format'] = number_format
+    # Get best and worst scenarios (worst first) from the precomputed index
+    index = mc_results.get('scenario_index')
+    best_scenarios, worst_scenarios = [], []
+    if index is not None:
+        filters = {key: request.args[key] for key in ScenarioIndex.GROUP_COLUMNS if request.args.get(key)}
+        best_scenarios = scenario_rows(scenarios, index.best(10, **filters))
+        worst_scenarios = scenario_rows(scenarios, index.worst(10, **filters))
     
     return render_template('risk-analytics.html',
                          metadata=metadata,
                          stats=stats,
-                         profit_data=profit_data_json,
-                         roi_data=roi_data_json,
-                         survival_data=survival_data_json,
-                         mortality_events=mortality_events_json,
-                         sorted_profits=sorted_profits_json,
-                         percentile_data=percentile_data,
+                         profit_data=charts['profit_data'],
+                         roi_data=charts['roi_data'],
+                         survival_data=charts['survival_data'],
+                         mortality_events=charts['mortality_events'],
+                         sorted_profits=charts['sorted_profits'],
+                         percentile_data=charts['percentile_data'],
                          best_scenarios=best_scenarios,
-                         worst_scenarios=worst_scenarios)
+                         worst_scenarios=worst_scenarios,
+                         fan_charts=charts['fan_charts'])
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
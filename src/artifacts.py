@@ -0,0 +1,69 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+class ArtifactLoader:
+    """Result files parsed once and kept in memory.
+
+    Each artifact is registered with its candidate paths and a parse
+    function. Every lookup stats the candidates in order up to the first
+    one that exists, so a higher-priority file shows up as soon as it is
+    written and a removed one falls back to the next. The chosen file is
+    parsed again only when its path, mtime or size changes."""
+
+    def __init__(self):
+        self.artifacts = {}
+
+    def register(self, name: str, candidates: List[str], parse: Callable[[str], object]):
+        self.artifacts[name] = {
+            'candidates': list(candidates),
+            'parse': parse,
+            'path': None,
+            'signature': None,
+            'value': None,
+            'lock': threading.Lock(),
+            'counters': {'hits': 0, 'loads': 0, 'load_ms': 0.0, 'last_load_ms': 0.0}
+        }
+
+    def get(self, name: str):
+        """The parsed artifact, or None when no candidate path exists"""
+        artifact = self.artifacts[name]
+        with artifact['lock']:
+            # one stat per candidate ahead of (and including) the file in use
+            for path in artifact['candidates']:
+                stat = self._stat(path)
+                if stat is not None:
+                    artifact['path'] = path
+                    break
+            else:
+                artifact['path'] = artifact['signature'] = artifact['value'] = None
+                return None
+
+            signature = (artifact['path'], stat.st_mtime_ns, stat.st_size)
+            counters = artifact['counters']
+            if signature == artifact['signature']:
+                counters['hits'] += 1
+                return artifact['value']
+
+            start = time.perf_counter()
+            artifact['value'] = artifact['parse'](artifact['path'])
+            artifact['signature'] = signature
+            counters['loads'] += 1
+            counters['last_load_ms'] = (time.perf_counter() - start) * 1000
+            counters['load_ms'] += counters['last_load_ms']
+            return artifact['value']
+
+    @staticmethod
+    def _stat(path: Optional[str]) -> Optional[os.stat_result]:
+        if path is None:
+            return None
+        try:
+            return os.stat(path)
+        except OSError:
+            return None
+
+    def stats(self) -> Dict:
+        return {name: {'path': artifact['path'], **artifact['counters']}
+                for name, artifact in self.artifacts.items()}
@@ -0,0 +1,321 @@
+import numpy as np
+from collections import deque
+import hashlib
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class GroupIndex:
+    """Records grouped by one field, groups in sorted label order: the
+    records of group g are order[offsets[g]:offsets[g + 1]], in file order"""
+
+    def __init__(self, labels: np.ndarray, order: np.ndarray, offsets: np.ndarray, codes: np.ndarray):
+        self.labels = labels
+        self.order = order
+        self.offsets = offsets
+        self.codes = codes
+
+    @classmethod
+    def build(cls, values: np.ndarray) -> 'GroupIndex':
+        order = np.argsort(values, kind='stable')
+        ordered = values[order]
+        starts = np.flatnonzero(ordered[1:] != ordered[:-1]) + 1
+        offsets = np.concatenate(([0], starts, [len(values)])) if len(values) else np.zeros(1, dtype=np.int64)
+        codes = np.empty(len(values), dtype=np.int64)
+        codes[order] = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        return cls(ordered[offsets[:-1]], order, offsets, codes)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @property
+    def counts(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @property
+    def first(self) -> np.ndarray:
+        """Position of each group's first record"""
+        return self.order[self.offsets[:-1]]
+
+    def rows(self, label) -> np.ndarray:
+        """Record positions of one group (empty when the label is absent)"""
+        g = np.searchsorted(self.labels, label)
+        if g == len(self.labels) or self.labels[g] != label:
+            return self.order[:0]
+        return self.order[self.offsets[g]:self.offsets[g + 1]]
+
+
+class DatasetStore:
+    """Columnar in-memory aquaculture dataset: one NumPy array per field,
+    with categorical fields held as integer codes into sorted labels"""
+
+    CATEGORICAL = ('species', 'regulatory_zone', 'disease_status')
+    INDEXED = ('site_id', 'species', 'regulatory_zone', 'cage_id')
+    AGGREGATIONS = ('sum', 'mean', 'min', 'max', 'first', 'count')
+
+    def __init__(self,
+                 columns: Dict[str, np.ndarray],
+                 categories: Dict[str, np.ndarray],
+                 version: Optional[str] = None):
+        self.columns = columns
+        self.categories = categories
+        # identifies the file contents the store was built from (see
+        # dataset_version); caches of derived values are keyed by it
+        self.version = version
+        self.fields = list(columns)
+        self.n_records = len(columns[self.fields[0]]) if self.fields else 0
+        # the store is read-only: the dashboard's group-by fields are indexed
+        # up front, any other field the first time it is grouped by
+        self.indexes = {field: GroupIndex.build(columns[field]) for field in self.INDEXED if field in columns}
+
+    @classmethod
+    def from_records(cls, records: List[Dict], version: Optional[str] = None) -> 'DatasetStore':
+        """Build the columns from a list of record dicts (the JSON layout)"""
+        columns, categories = {}, {}
+        for field in (records[0] if records else {}):
+            values = [record[field] for record in records]
+            if field in cls.CATEGORICAL:
+                labels, codes = np.unique(np.array(values, dtype=str), return_inverse=True)
+                categories[field] = labels
+                columns[field] = codes.astype(np.int32)
+            else:
+                columns[field] = np.asarray(values)
+        return cls(columns, categories, version)
+
+    def __len__(self) -> int:
+        return self.n_records
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        """A numeric column, or the decoded labels of a categorical one"""
+        if field in self.categories:
+            return self.categories[field][self.columns[field]]
+        return self.columns[field]
+
+    def values(self, field: str, rows) -> np.ndarray:
+        """Values of field at the given rows (index array or slice), decoding
+        only those rows of a categorical field"""
+        values = self.columns[field][rows]
+        if field in self.categories:
+            return self.categories[field][values]
+        return values
+
+    def mean(self, field: str) -> float:
+        return float(np.mean(self.columns[field])) if self.n_records else 0.0
+
+    def sum(self, field: str) -> float:
+        return float(np.sum(self.columns[field]))
+
+    def index(self, field: str) -> GroupIndex:
+        if field not in self.indexes:
+            self.indexes[field] = GroupIndex.build(self.columns[field])
+        return self.indexes[field]
+
+    def labels(self, field: str) -> np.ndarray:
+        """Sorted distinct values of field (decoded for categorical fields)"""
+        labels = self.index(field).labels
+        if field in self.categories:
+            return self.categories[field][labels]
+        return labels
+
+    def nunique(self, field: str) -> int:
+        return len(self.index(field))
+
+    def value_counts(self, field: str) -> Tuple[List, List[int]]:
+        """Sorted labels and the number of records with each"""
+        return self.labels(field).tolist(), self.index(field).counts.tolist()
+
+    def aggregate(self, by: str, **specs: Tuple[str, str]) -> Dict[str, np.ndarray]:
+        """One value per group of `by`, in sorted label order, for every
+        name=(field, how) with how in AGGREGATIONS; 'first' takes the value
+        of the group's first record. The labels are returned under `by`.
+        Each aggregate is a single pass over its column."""
+        index = self.index(by)
+        counts = index.counts
+        result = {by: self.labels(by)}
+        for name, (field, how) in specs.items():
+            if how not in self.AGGREGATIONS:
+                raise ValueError(f"aggregation must be one of {self.AGGREGATIONS}, got {how!r}")
+            if how == 'count':
+                result[name] = counts
+            elif how == 'first':
+                result[name] = self.values(field, index.first)
+            elif how in ('sum', 'mean'):
+                totals = np.bincount(index.codes, weights=self.columns[field], minlength=len(index))
+                result[name] = totals / counts if how == 'mean' else totals
+            else:
+                reduce = np.minimum if how == 'min' else np.maximum
+                result[name] = reduce.reduceat(self.columns[field][index.order], index.offsets[:-1])
+        return result
+
+    def records(self, start: int = 0, stop: Optional[int] = None) -> List[Dict]:
+        """Rows start:stop as record dicts of plain Python values"""
+        columns = {field: self.values(field, slice(start, stop)).tolist() for field in self.fields}
+        return [dict(zip(self.fields, row)) for row in zip(*columns.values())]
+
+
+def dataset_version(path: str, content: bytes) -> str:
+    """File mtime plus a content hash: a touched but unchanged file keeps
+    its hash, an edit within the mtime resolution still changes it"""
+    return f"{os.stat(path).st_mtime_ns}-{hashlib.sha256(content).hexdigest()[:16]}"
+
+
+class AggregateCache:
+    """Values derived from one dataset version, computed once per name.
+
+    Looking a name up under a new version drops every entry of the old one,
+    so a reloaded dataset invalidates the cache by itself. The last few
+    replaced versions (None, before any dataset, included) are remembered:
+    a request still holding one gets its value computed but not stored, so
+    it cannot switch the cache back. Hits, misses and compute times are
+    counted per name."""
+
+    RETIRED_VERSIONS = 4
+
+    def __init__(self):
+        self.version = None
+        self.entries = {}
+        self.invalidations = 0
+        self.retired = deque(maxlen=self.RETIRED_VERSIONS)
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, version: Optional[str], compute: Callable[[], object]):
+        with self._lock:
+            if version != self.version and version not in self.retired:
+                self.retired.append(self.version)
+                if self.entries:
+                    self.invalidations += 1
+                self.entries = {}
+                self.version = version
+            counters = self.counters.setdefault(name, {'hits': 0, 'misses': 0, 'compute_ms': 0.0,
+                                                       'last_compute_ms': 0.0})
+            if version == self.version and name in self.entries:
+                counters['hits'] += 1
+                return self.entries[name]
+            counters['misses'] += 1
+
+        # computed outside the lock; concurrent misses may both compute
+        start = time.perf_counter()
+        value = compute()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            counters['compute_ms'] += elapsed_ms
+            counters['last_compute_ms'] = elapsed_ms
+            if version == self.version:
+                self.entries[name] = value
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self.entries = {}
+            self.version = None
+            self.invalidations += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            routes = {}
+            for name, counters in self.counters.items():
+                lookups = counters['hits'] + counters['misses']
+                routes[name] = {**counters,
+                                'hit_rate': counters['hits'] / lookups if lookups else 0.0,
+                                'mean_compute_ms': counters['compute_ms'] / counters['misses']
+                                if counters['misses'] else 0.0}
+            return {'version': self.version,
+                    'entries': len(self.entries),
+                    'invalidations': self.invalidations,
+                    'routes': routes}
+
+
+class DatasetWatcher:
+    """The current DatasetStore, rebuilt in the background when its file changes.
+
+    A daemon thread stats the file every `interval` seconds and reloads it
+    when its path, mtime or size changes. The new store is built off the
+    request path and swapped in with one assignment, so a request that read
+    `store` keeps a consistent snapshot. A file that fails to load (one
+    still being written, say) or that disappears leaves the current store
+    in place; a failed file is retried once it changes again."""
+
+    def __init__(self,
+                 locate: Callable[[], Optional[str]],
+                 load: Callable[[Optional[str]], DatasetStore],
+                 interval: float = 5.0):
+        if interval <= 0:
+            raise ValueError(f"interval must be positive, got {interval}")
+        self.locate = locate
+        self.load = load
+        self.interval = interval
+        self.path = locate()
+        self.signature = self._signature(self.path)
+        self.store = load(self.path)
+        self.counters = {'reloads': 0, 'failures': 0, 'last_load_ms': 0.0, 'last_error': None}
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _signature(path: Optional[str]) -> Optional[Tuple[str, int, int]]:
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (path, stat.st_mtime_ns, stat.st_size)
+
+    def check(self) -> bool:
+        """Reload if the file changed since the last load; True if swapped"""
+        with self._lock:
+            path = self.path if self._signature(self.path) else self.locate()
+            signature = self._signature(path)
+            # a file that disappeared leaves the last store being served
+            if signature is None or signature == self.signature:
+                return False
+            start = time.perf_counter()
+            try:
+                store = self.load(path)
+            except Exception as error:
+                self.counters['failures'] += 1
+                self.counters['last_error'] = f"{path}: {error}"
+                self.signature = signature
+                return False
+            self.counters['last_load_ms'] = (time.perf_counter() - start) * 1000
+            self.counters['reloads'] += 1
+            self.counters['last_error'] = None
+            self.path, self.signature = path, signature
+            self.store = store
+            return True
+
+    def start(self) -> 'DatasetWatcher':
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='dataset-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def stats(self) -> Dict:
+        store = self.store
+        return {'path': self.path,
+                'version': store.version,
+                'records': len(store),
+                'running': self._thread is not None and self._thread.is_alive(),
+                **self.counters}
+
+
+def column_rows(columns: Dict[str, np.ndarray], rows=slice(None)) -> List[Dict]:
+    """Row dicts of plain Python values from equal-length columns (such as
+    an aggregate() result), optionally restricted to the given rows"""
+    values = {name: np.asarray(column)[rows].tolist() for name, column in columns.items()}
+    return [dict(zip(values, row)) for row in zip(*values.values())]
@@ -509,6 +509,78 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // ==========================================
+    // FAN CHARTS (per-timestep quantile bands)
+    // ==========================================
+    document.querySelectorAll('canvas.fan-chart').forEach(fanCanvas => {
+        const fan = JSON.parse(fanCanvas.dataset.fan);
+        const chart = fan[fanCanvas.dataset.kind];
+        const unit = fanCanvas.dataset.unit;
+        if (!chart) return;
+
+        const [low, midLow, median, midHigh, high] = fan.levels.map(
+            level => chart['p' + String(level).padStart(2, '0')]
+        );
+        const points = values => values.map((y, i) => ({ x: fan.days[i], y: y }));
+        const format = value => unit === '$'
+            ? '$' + value.toLocaleString('en-US', { maximumFractionDigits: 2 })
+            : value.toLocaleString('en-US', { maximumFractionDigits: 0 }) + ' ' + unit;
+
+        const ctx = fanCanvas.getContext('2d');
+        new Chart(ctx, {
+            type: 'line',
+            data: {
+                datasets: [
+                    { label: `P${fan.levels[0]}`, data: points(low), borderColor: colors.info, borderWidth: 1, pointRadius: 0, fill: false },
+                    { label: `P${fan.levels[4]}`, data: points(high), borderColor: colors.info, backgroundColor: 'rgba(59, 130, 246, 0.15)', borderWidth: 1, pointRadius: 0, fill: '-1' },
+                    { label: `P${fan.levels[1]}`, data: points(midLow), borderColor: colors.primary, borderWidth: 1, pointRadius: 0, fill: false },
+                    { label: `P${fan.levels[3]}`, data: points(midHigh), borderColor: colors.primary, backgroundColor: 'rgba(30, 58, 138, 0.25)', borderWidth: 1, pointRadius: 0, fill: '-1' },
+                    { label: 'Median', data: points(median), borderColor: colors.primaryBorder, borderWidth: 3, pointRadius: 0, fill: false },
+                    { label: 'Mean', data: points(chart.mean), borderColor: colors.warningBorder, borderWidth: 2, borderDash: [6, 4], pointRadius: 0, fill: false }
+                ]
+            },
+            options: {
+                ...commonOptions,
+                interaction: { mode: 'index', intersect: false },
+                scales: {
+                    x: {
+                        type: 'linear',
+                        grid: { color: 'rgba(0, 0, 0, 0.05)' },
+                        ticks: { font: { size: 11 } },
+                        title: {
+                            display: true,
+                            text: 'Day',
+                            font: { size: 13, weight: 'bold' }
+                        }
+                    },
+                    y: {
+                        grid: { color: 'rgba(0, 0, 0, 0.05)' },
+                        ticks: {
+                            font: { size: 11 },
+                            callback: function(value) {
+                                return format(value);
+                            }
+                        }
+                    }
+                },
+                plugins: {
+                    ...commonOptions.plugins,
+                    tooltip: {
+                        ...commonOptions.plugins.tooltip,
+                        callbacks: {
+                            title: function(context) {
+                                return `Day ${context[0].parsed.x.toFixed(0)}`;
+                            },
+                            label: function(context) {
+                                return ` ${context.dataset.label}: ${format(context.parsed.y)}`;
+                            }
+                        }
+                    }
+                }
+            }
+        });
+    });
+
     // ==========================================
     // HELPER FUNCTION
     // ==========================================
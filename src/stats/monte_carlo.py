@@ -1,27 +1,1345 @@
 import numpy as np
 import pandas as pd
+import hashlib
 import json
+import itertools
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
+from functools import lru_cache
+from typing import Dict, List, Tuple, Optional, Union
+from scipy.stats import norm, qmc
+
+try:
+    import fcntl
+except ImportError:  # Windows: index updates are not locked
+    fcntl = None
+
+
+def _per_path(value, dtype=np.float64) -> np.ndarray:
+    """Broadcast a scalar or per-unit parameter against (..., time) arrays"""
+    return np.asarray(value, dtype=dtype)[..., None]
+
+
+def gbm_paths(S0, mu, sigma, dW: np.ndarray, dt: float) -> np.ndarray:
+    """Geometric Brownian motion with annual mu/sigma on a daily clock;
+    dW has time on the last axis and broadcasts against per-unit parameters;
+    the path is computed and stored in dW's floating dtype"""
+    dtype = dW.dtype
+    mu_daily = _per_path(mu, dtype) / 365
+    sigma_daily = _per_path(sigma, dtype) / float(np.sqrt(365))
+    log_returns = (mu_daily - 0.5 * sigma_daily**2) * dt + sigma_daily * dW
+    S = np.empty(log_returns.shape[:-1] + (log_returns.shape[-1] + 1,), dtype=dtype)
+    S[..., 0] = S0
+    S[..., 1:] = _per_path(S0, dtype) * np.exp(np.cumsum(log_returns, axis=-1))
+    return S
+
+
+def jump_diffusion_paths(W0, growth_rate, growth_vol, jump_mean, jump_std,
+                         dW: np.ndarray, jumps: np.ndarray, jump_z: np.ndarray,
+                         dt: float) -> np.ndarray:
+    """Proportional growth with mortality jumps of size N(jump_mean, jump_std)
+    where jumps is True; jump_z are the standard normal jump draws"""
+    dtype = dW.dtype
+    jump_sizes = _per_path(jump_mean, dtype) + _per_path(jump_std, dtype) * jump_z
+    factor = (1 + _per_path(growth_rate, dtype) * dt + _per_path(growth_vol, dtype) * dW
+              + np.where(jumps, jump_sizes, 0))
+    # W[t+1] = max(W[t] * factor[t], 0) with W[t] >= 0 is a running product
+    W = np.empty(factor.shape[:-1] + (factor.shape[-1] + 1,), dtype=dtype)
+    W[..., 0] = W0
+    W[..., 1:] = _per_path(W0, dtype) * np.cumprod(np.maximum(factor, 0), axis=-1)
+    return W
+
+
+def ou_paths(C0, theta, mu, sigma, dW: np.ndarray, dt: float) -> np.ndarray:
+    """Ornstein-Uhlenbeck cost process floored at zero"""
+    theta, mu, sigma = (np.asarray(x, dtype=dW.dtype) for x in (theta, mu, sigma))
+    shape = np.broadcast_shapes(dW.shape[:-1], np.shape(C0), theta.shape, mu.shape, sigma.shape)
+    C = np.empty(shape + (dW.shape[-1] + 1,), dtype=dW.dtype)
+    C[..., 0] = C0
+    # the floor at zero makes OU recursive, so only the time axis is looped
+    for t in range(dW.shape[-1]):
+        C[..., t + 1] = np.maximum(C[..., t] + theta * (mu - C[..., t]) * dt + sigma * dW[..., t], 0)
+    return C
+
+
+@lru_cache(maxsize=None)
+def _brownian_bridge_plan(n_steps: int) -> Tuple[np.ndarray, ...]:
+    """Construction order for a Brownian bridge on times 1..n_steps (Jaeckel):
+    the terminal point first, then recursive midpoints of the open gaps."""
+    bridge = np.zeros(n_steps, dtype=np.int64)
+    left = np.zeros(n_steps, dtype=np.int64)
+    right = np.zeros(n_steps, dtype=np.int64)
+    left_weight = np.zeros(n_steps)
+    right_weight = np.zeros(n_steps)
+    std_dev = np.zeros(n_steps)
+
+    filled = np.zeros(n_steps, dtype=bool)
+    filled[-1] = True
+    bridge[0] = n_steps - 1
+    std_dev[0] = np.sqrt(n_steps)
+    j = 0
+    for i in range(1, n_steps):
+        while filled[j]:
+            j += 1
+        k = j
+        while not filled[k]:
+            k += 1
+        # point l bridges W(j) (W(0) = 0 when j == 0) and W(k + 1)
+        l = j + (k - 1 - j) // 2
+        filled[l] = True
+        bridge[i], left[i], right[i] = l, j, k
+        left_weight[i] = (k - l) / (k + 1 - j)
+        right_weight[i] = (l + 1 - j) / (k + 1 - j)
+        std_dev[i] = np.sqrt((l + 1 - j) * (k - l) / (k + 1 - j))
+        j = k + 1
+        if j >= n_steps:
+            j = 0
+    return bridge, left, right, left_weight, right_weight, std_dev
+
+
+def brownian_bridge_increments(z: np.ndarray, dt: float) -> np.ndarray:
+    """Map standard normals (n_paths, n_steps), ordered by importance, to
+    Brownian increments: z[:, 0] fixes the terminal value, later columns
+    fill in successively finer midpoints."""
+    n_steps = z.shape[1]
+    bridge, left, right, left_weight, right_weight, std_dev = _brownian_bridge_plan(n_steps)
+    W = np.empty_like(z)
+    W[:, bridge[0]] = std_dev[0] * z[:, 0]
+    for i in range(1, n_steps):
+        l, j, k = bridge[i], left[i], right[i]
+        W[:, l] = right_weight[i] * W[:, k] + std_dev[i] * z[:, i]
+        if j > 0:
+            W[:, l] += left_weight[i] * W[:, j - 1]
+    return np.sqrt(dt) * np.diff(W, axis=1, prepend=0.0)
+
+
+NPZ_FORMAT_VERSION = 1
+
+RISK_METRIC_LEVELS = {'var_95': 0.05, 'var_99': 0.01, 'cvar_95': 0.05, 'cvar_99': 0.01}
+
+# metrics that carry standard errors and effective sample sizes
+REPLICATE_METRICS = ('mean_profit', 'prob_loss', *RISK_METRIC_LEVELS)
+
+# quantile bands of the per-timestep fan charts
+FAN_CHART_LEVELS = (0.05, 0.25, 0.50, 0.75, 0.95)
+
+
+def _density_at_quantile(quantile_fn, p: float, n: int) -> float:
+    """Sparsity estimate f(q_p) ~ 2h / (q_{p+h} - q_{p-h})"""
+    h = min(0.5 * p, n ** (-1 / 3))
+    spread = quantile_fn(p + h) - quantile_fn(p - h)
+    return 2 * h / spread if spread > 0 else np.inf
+
+
+def _sorted_percentiles(sorted_values: np.ndarray, levels) -> np.ndarray:
+    """np.percentile(values, levels) (linear interpolation) read off an
+    already sorted array; uses NumPy's two-sided lerp so results match it
+    bit for bit"""
+    n = len(sorted_values)
+    position = np.asarray(levels, dtype=np.float64) / 100 * (n - 1)
+    lo = np.floor(position).astype(np.int64)
+    hi = np.minimum(lo + 1, n - 1)
+    t = position - lo
+    a, b = sorted_values[lo], sorted_values[hi]
+    return np.where(t >= 0.5, b - (b - a) * (1 - t), a + (b - a) * t)
+
+
+def _level_key(prefix: str, value: float) -> str:
+    """'p05', 'var_95', 'var_97.5' style keys"""
+    return f'{prefix}{value:02.0f}' if float(value).is_integer() else f'{prefix}{value:g}'
+
+
+def risk_metrics(values: np.ndarray,
+                 percentiles=(1, 5, 10, 25, 50, 75, 90, 95, 99),
+                 confidence_levels=(0.95, 0.99),
+                 thresholds=(0.0,),
+                 presorted: bool = False) -> Dict:
+    """Order statistics of a sample from a single sort.
+
+    Returns n, mean, std, min, max, the requested percentiles ('p05', ...),
+    VaR and CVaR at each confidence level ('var_95' is the 5th percentile,
+    'cvar_95' the mean of the values at or below it) and, per threshold,
+    the number of values below and above it. Pass presorted=True for an
+    array that is already sorted ascending (e.g. ScenarioIndex.sorted_profit)."""
+    values = np.asarray(values, dtype=np.float64)
+    ordered = values if presorted else np.sort(values)
+    n = len(ordered)
+    metrics = {'n': n,
+               'mean': float(np.mean(values)),
+               'std': float(np.std(values)),
+               'min': float(ordered[0]),
+               'max': float(ordered[-1])}
+    for level, value in zip(percentiles, _sorted_percentiles(ordered, percentiles)):
+        metrics[_level_key('p', level)] = float(value)
+
+    tail_levels = [100 * (1 - c) for c in confidence_levels]
+    for confidence, var in zip(confidence_levels, _sorted_percentiles(ordered, tail_levels)):
+        tail = int(np.searchsorted(ordered, var, side='right'))
+        metrics[_level_key('var_', 100 * confidence)] = float(var)
+        metrics[_level_key('cvar_', 100 * confidence)] = float(np.mean(ordered[:tail]))
+
+    metrics['tail_counts'] = {
+        threshold: {'below': int(np.searchsorted(ordered, threshold, side='left')),
+                    'above': n - int(np.searchsorted(ordered, threshold, side='right'))}
+        for threshold in thresholds
+    }
+    return metrics
+
+
+def risk_metric_estimates(profits: np.ndarray,
+                          paired: bool = False,
+                          control: Optional[np.ndarray] = None,
+                          ordered: Optional[np.ndarray] = None,
+                          replicate_size: Optional[int] = None) -> Tuple[Dict, Dict, Dict]:
+    """Point estimates, standard errors and effective sample sizes for
+    mean_profit, var/cvar at 95%/99% and prob_loss.
+
+    Each metric is linearised through its influence function psi_i. With
+    ``paired`` (antithetic rows 2k, 2k+1) psi is averaged within pairs before
+    the variance is taken; with ``control`` (zero-mean control variate
+    samples) the estimate and psi are adjusted by the regression coefficient
+    on the control. With ``replicate_size`` (randomised QMC, consecutive
+    blocks of that many rows scrambled independently) the SE is the spread
+    of the block means of psi over the full blocks, falling back to the iid
+    SE with fewer than two blocks. The effective sample size is
+    var(psi) / SE**2, i.e. the number of plain Monte Carlo draws giving the
+    same precision. Pass ``ordered``, profits sorted ascending (e.g.
+    ScenarioIndex.sorted_profit), to reuse an existing sort."""
+    n = len(profits)
+    # one sort serves every quantile, including the density estimates
+    if ordered is None:
+        ordered = np.sort(profits)
+    quantile = lambda p: float(_sorted_percentiles(ordered, [100 * p])[0])
+    estimates = {'mean_profit': float(np.mean(profits)),
+                 'prob_loss': float(np.mean(profits < 0))}
+    influence = {'mean_profit': profits - estimates['mean_profit'],
+                 'prob_loss': (profits < 0) - estimates['prob_loss']}
+
+    for metric, p in RISK_METRIC_LEVELS.items():
+        q = quantile(p)
+        if metric.startswith('var'):
+            estimates[metric] = q
+            influence[metric] = (p - (profits <= q)) / _density_at_quantile(quantile, p, n)
+        else:
+            tail = profits <= q
+            estimates[metric] = float(np.mean(profits[tail]))
+            influence[metric] = np.where(tail, profits - q, 0.0) / p + q - estimates[metric]
+
+    standard_errors, ess = {}, {}
+    for metric, psi in influence.items():
+        raw_variance = float(np.var(psi))
+        if control is not None and np.var(control) > 0:
+            beta = np.cov(psi, control, bias=True)[0, 1] / np.var(control)
+            estimates[metric] = float(estimates[metric] - beta * np.mean(control))
+            psi = psi - beta * (control - np.mean(control))
+        if replicate_size and n >= 2 * replicate_size:
+            r = n // replicate_size
+            means = psi[:r * replicate_size].reshape(r, replicate_size).mean(axis=1)
+            se = float(np.std(means, ddof=1) / np.sqrt(r))
+        else:
+            if paired and n >= 2:
+                m = n // 2
+                psi = (psi[0:2 * m:2] + psi[1:2 * m:2]) / 2
+            se = float(np.std(psi) / np.sqrt(len(psi)))
+        standard_errors[metric] = se
+        ess[metric] = float(raw_variance / se**2) if se > 0 else float(n)
+    return estimates, standard_errors, ess
+
+
+class RunningMoments:
+    """Count, mean, variance, min and max updated batch by batch (Chan et al.)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return
+        other = RunningMoments()
+        other.count = values.size
+        other.mean = float(np.mean(values))
+        other.m2 = float(np.sum((values - other.mean) ** 2))
+        other.min = float(np.min(values))
+        other.max = float(np.max(values))
+        self.merge(other)
+
+    def merge(self, other: 'RunningMoments'):
+        if other.count == 0:
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta**2 * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.m2 / self.count)) if self.count else 0.0
+
+
+class _BucketStore:
+    """Dense bucket counts for consecutive integer keys starting at offset;
+    folded counts the values moved into a larger bucket to stay within
+    max_buckets"""
+
+    def __init__(self):
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.folded = 0
+
+    def add_counts(self, offset: int, counts: np.ndarray, max_buckets: int):
+        if counts.size == 0:
+            return
+        if self.counts.size == 0:
+            self.offset, self.counts = offset, counts.astype(np.int64)
+        else:
+            lo = min(self.offset, offset)
+            hi = max(self.offset + self.counts.size, offset + counts.size)
+            merged = np.zeros(hi - lo, dtype=np.int64)
+            merged[self.offset - lo:self.offset - lo + self.counts.size] += self.counts
+            merged[offset - lo:offset - lo + counts.size] += counts
+            self.offset, self.counts = lo, merged
+        if self.counts.size > max_buckets:
+            # fold the smallest magnitudes together so the tails keep full accuracy
+            excess = self.counts.size - max_buckets
+            moved = int(self.counts[:excess].sum())
+            self.folded += moved
+            self.counts[excess] += moved
+            self.counts = self.counts[excess:].copy()
+            self.offset += excess
+
+    def add_keys(self, keys: np.ndarray, max_buckets: int):
+        if keys.size:
+            lo = int(keys.min())
+            self.add_counts(lo, np.bincount(keys - lo), max_buckets)
+
+    @property
+    def keys(self) -> np.ndarray:
+        return np.arange(self.offset, self.offset + self.counts.size)
+
+
+class QuantileSketch:
+    """Mergeable log-bucket quantile sketch (DDSketch) with at most
+    max_buckets buckets per sign. While the keys seen fit in max_buckets,
+    every quantile is returned within relative_accuracy of a true sample
+    value of that rank, whatever the sample size. Beyond that the smallest
+    magnitudes are folded into a larger bucket and quantiles in the folded
+    range lose the guarantee; folded counts the values affected."""
+
+    def __init__(self,
+                 relative_accuracy: float = 0.005,
+                 max_buckets: int = 4096,
+                 min_value: float = 1e-9):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.max_buckets = max_buckets
+        self.min_value = min_value
+        self.positive = _BucketStore()
+        self.negative = _BucketStore()
+        self.zero_count = 0
+        self.count = 0
+
+    def _keys(self, magnitudes: np.ndarray) -> np.ndarray:
+        return np.ceil(np.log(magnitudes) / np.log(self.gamma)).astype(np.int64)
+
+    def _bucket_values(self, keys: np.ndarray) -> np.ndarray:
+        return 2 * self.gamma ** keys.astype(np.float64) / (self.gamma + 1)
+
+    def add(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        positive = values > self.min_value
+        negative = values < -self.min_value
+        self.positive.add_keys(self._keys(values[positive]), self.max_buckets)
+        self.negative.add_keys(self._keys(-values[negative]), self.max_buckets)
+        self.zero_count += int(values.size - positive.sum() - negative.sum())
+        self.count += values.size
+
+    def merge(self, other: 'QuantileSketch'):
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        self.positive.add_counts(other.positive.offset, other.positive.counts, self.max_buckets)
+        self.negative.add_counts(other.negative.offset, other.negative.counts, self.max_buckets)
+        self.positive.folded += other.positive.folded
+        self.negative.folded += other.negative.folded
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    @property
+    def folded(self) -> int:
+        """Values whose bucket was folded; 0 means the accuracy bound holds"""
+        return self.positive.folded + self.negative.folded
+
+    def _sorted_buckets(self) -> Tuple[np.ndarray, np.ndarray]:
+        values = np.concatenate([
+            -self._bucket_values(self.negative.keys)[::-1],
+            [0.0],
+            self._bucket_values(self.positive.keys)
+        ])
+        counts = np.concatenate([self.negative.counts[::-1], [self.zero_count], self.positive.counts])
+        return values, counts
+
+    def quantiles(self, qs) -> np.ndarray:
+        if self.count == 0:
+            return np.full(len(qs), np.nan)
+        values, counts = self._sorted_buckets()
+        ranks = np.asarray(qs, dtype=np.float64) * (self.count - 1)
+        return values[np.searchsorted(np.cumsum(counts), ranks, side='right')]
+
+    def quantile(self, q: float) -> float:
+        return float(self.quantiles([q])[0])
+
+    def rank(self, value: float) -> int:
+        """Approximate number of values <= value"""
+        values, counts = self._sorted_buckets()
+        return int(counts[values <= value].sum())
+
+    def tail_mean(self, q: float) -> float:
+        """Mean of the values at or below the q-quantile (CVaR for profits)"""
+        threshold = self.quantile(q)
+        values, counts = self._sorted_buckets()
+        tail = values <= threshold
+        return float(np.sum(values[tail] * counts[tail]) / counts[tail].sum())
+
+    def tail_excess_variance(self, q: float) -> float:
+        """Variance of (X - q_q) * 1{X <= q_q}, the CVaR influence term"""
+        threshold = self.quantile(q)
+        values, counts = self._sorted_buckets()
+        excess = np.where(values <= threshold, values - threshold, 0.0)
+        mean = np.sum(excess * counts) / self.count
+        return float(np.sum(excess**2 * counts) / self.count - mean**2)
+
+
+class TimestepSketch:
+    """QuantileSketch over every column of (n, n_timesteps) non-negative
+    path arrays at once: one row of log-bucket counts per timestep on a
+    shared key range, plus running sums for the mean path"""
+
+    def __init__(self,
+                 n_timesteps: int,
+                 relative_accuracy: float = 0.005,
+                 max_buckets: int = 4096,
+                 min_value: float = 1e-9):
+        self.n_timesteps = n_timesteps
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.max_buckets = max_buckets
+        self.min_value = min_value
+        self.offset = 0
+        self.counts = np.zeros((n_timesteps, 0), dtype=np.int64)
+        self.zero_counts = np.zeros(n_timesteps, dtype=np.int64)
+        self.sums = np.zeros(n_timesteps)
+        self.count = 0
+
+    @classmethod
+    def from_paths(cls, paths: np.ndarray) -> 'TimestepSketch':
+        sketch = cls(paths.shape[1])
+        sketch.add(paths)
+        return sketch
+
+    def add(self, paths: np.ndarray):
+        paths = np.asarray(paths, dtype=np.float64)
+        self.sums += paths.sum(axis=0)
+        self.count += len(paths)
+        positive = paths > self.min_value
+        self.zero_counts += np.sum(~positive, axis=0)
+        keys = np.ceil(np.log(paths[positive]) / np.log(self.gamma)).astype(np.int64)
+        if keys.size == 0:
+            return
+        lo = int(keys.min())
+        width = int(keys.max()) - lo + 1
+        timesteps = np.broadcast_to(np.arange(self.n_timesteps), paths.shape)[positive]
+        counts = np.bincount(timesteps * width + (keys - lo), minlength=self.n_timesteps * width)
+        self._add_counts(lo, counts.reshape(self.n_timesteps, width))
+
+    def _add_counts(self, offset: int, counts: np.ndarray):
+        if counts.shape[1] == 0:
+            return
+        if self.counts.shape[1] == 0:
+            self.offset, self.counts = offset, counts.astype(np.int64)
+        else:
+            lo = min(self.offset, offset)
+            hi = max(self.offset + self.counts.shape[1], offset + counts.shape[1])
+            merged = np.zeros((self.n_timesteps, hi - lo), dtype=np.int64)
+            merged[:, self.offset - lo:self.offset - lo + self.counts.shape[1]] += self.counts
+            merged[:, offset - lo:offset - lo + counts.shape[1]] += counts
+            self.offset, self.counts = lo, merged
+        if self.counts.shape[1] > self.max_buckets:
+            # as in _BucketStore: fold the smallest magnitudes together
+            excess = self.counts.shape[1] - self.max_buckets
+            self.counts[:, excess] += self.counts[:, :excess].sum(axis=1)
+            self.counts = self.counts[:, excess:].copy()
+            self.offset += excess
+
+    def merge(self, other: 'TimestepSketch'):
+        if other.gamma != self.gamma or other.n_timesteps != self.n_timesteps:
+            raise ValueError("Cannot merge timestep sketches with different shapes or accuracy")
+        self._add_counts(other.offset, other.counts)
+        self.zero_counts += other.zero_counts
+        self.sums += other.sums
+        self.count += other.count
+
+    def quantiles(self, qs) -> np.ndarray:
+        """(len(qs), n_timesteps) array of per-timestep quantiles"""
+        if self.count == 0:
+            return np.full((len(qs), self.n_timesteps), np.nan)
+        keys = np.arange(self.offset, self.offset + self.counts.shape[1])
+        values = np.concatenate([[0.0], 2 * self.gamma ** keys.astype(np.float64) / (self.gamma + 1)])
+        cumulative = np.cumsum(np.column_stack([self.zero_counts, self.counts]), axis=1)
+        ranks = np.asarray(qs, dtype=np.float64)[:, None, None] * (self.count - 1)
+        # per-row searchsorted(cumulative, rank, side='right')
+        return values[np.sum(cumulative[None] <= ranks, axis=2)]
+
+    @property
+    def mean(self) -> np.ndarray:
+        return self.sums / self.count if self.count else np.full(self.n_timesteps, np.nan)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {'meta': np.array([self.relative_accuracy, self.max_buckets, self.min_value,
+                                  self.offset, self.count]),
+                'counts': self.counts,
+                'zero_counts': self.zero_counts,
+                'sums': self.sums}
+
+    @classmethod
+    def from_arrays(cls, arrays) -> 'TimestepSketch':
+        accuracy, max_buckets, min_value, offset, count = arrays['meta']
+        sketch = cls(len(arrays['sums']), float(accuracy), int(max_buckets), float(min_value))
+        sketch.offset, sketch.count = int(offset), int(count)
+        sketch.counts = arrays['counts'].astype(np.int64)
+        sketch.zero_counts = arrays['zero_counts'].astype(np.int64)
+        sketch.sums = arrays['sums'].astype(np.float64)
+        return sketch
+
+
+class FanChart:
+    """Per-timestep quantile bands and mean of each path type, accumulated
+    shard by shard so the path matrices never have to be kept"""
+
+    def __init__(self, sketches: Optional[Dict[str, TimestepSketch]] = None):
+        self.sketches = sketches or {}
+
+    @classmethod
+    def from_batch(cls, batch: Dict[str, np.ndarray]) -> 'FanChart':
+        return cls({kind: TimestepSketch.from_paths(batch[kind]) for kind in ScenarioStore.PATH_COLUMNS})
+
+    def merge(self, other: 'FanChart'):
+        for kind, sketch in other.sketches.items():
+            if kind not in self.sketches:
+                self.sketches[kind] = TimestepSketch(sketch.n_timesteps, sketch.relative_accuracy,
+                                                     sketch.max_buckets, sketch.min_value)
+            self.sketches[kind].merge(sketch)
+
+    def bands(self, horizon_days: float, levels=FAN_CHART_LEVELS) -> Dict:
+        """{'days', 'levels', <path type>: {'mean', 'p05', ...}} as plain lists"""
+        charts = {'levels': [round(100 * q) for q in levels]}
+        for kind, sketch in self.sketches.items():
+            charts['days'] = np.linspace(0, horizon_days, sketch.n_timesteps).tolist()
+            chart = {'mean': sketch.mean.tolist()}
+            for q, band in zip(levels, sketch.quantiles(levels)):
+                chart[f'p{round(100 * q):02d}'] = band.tolist()
+            charts[kind] = chart
+        return charts
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {f'{kind}.{key}': value
+                for kind, sketch in self.sketches.items()
+                for key, value in sketch.to_arrays().items()}
+
+    @classmethod
+    def from_arrays(cls, arrays) -> 'FanChart':
+        grouped = {}
+        for key, value in arrays.items():
+            kind, _, name = key.partition('.')
+            grouped.setdefault(kind, {})[name] = value
+        return cls({kind: TimestepSketch.from_arrays(group) for kind, group in grouped.items()})
+
+
+class StreamingSummary:
+    """Constant-memory accumulator behind MonteCarlo_Simulation.summary_stats:
+    online moments plus quantile sketches for profit and ROI"""
+
+    def __init__(self, relative_accuracy: float = 0.005):
+        self.profit_moments = RunningMoments()
+        self.roi_moments = RunningMoments()
+        self.profit_sketch = QuantileSketch(relative_accuracy)
+        self.roi_sketch = QuantileSketch(relative_accuracy)
+        self.counts = {'loss': 0, 'profit': 0, 'high_return': 0,
+                       'breakeven': 0, 'profit_over_1000': 0}
+        self.mortality_events = 0
+        self.fan_chart: Optional[FanChart] = None
+        # moments of per-shard estimates when shards are independent
+        # randomised QMC replicates; empty otherwise
+        self.replicates: Dict[str, RunningMoments] = {}
+
+    @classmethod
+    def from_batch(cls, batch: Dict[str, np.ndarray], replicate: bool = False) -> 'StreamingSummary':
+        """Summary of one shard; with replicate, the shard's own risk metric
+        estimates are also recorded so the spread between shards gives the
+        standard errors"""
+        summary = cls()
+        summary.update(batch['profit'], batch['roi'], batch['n_mortality_events'])
+        if replicate:
+            estimates, _, _ = risk_metric_estimates(batch['profit'])
+            for metric in REPLICATE_METRICS:
+                summary.replicates[metric] = RunningMoments()
+                summary.replicates[metric].update([estimates[metric]])
+        return summary
+
+    @property
+    def count(self) -> int:
+        return self.profit_moments.count
+
+    @property
+    def mean_mortality_events(self) -> float:
+        return self.mortality_events / self.count if self.count else 0.0
+
+    def update(self, profits: np.ndarray, returns: np.ndarray, n_mortality_events: np.ndarray):
+        self.profit_moments.update(profits)
+        self.roi_moments.update(returns)
+        self.profit_sketch.add(profits)
+        self.roi_sketch.add(returns)
+        self.counts['loss'] += int(np.sum(profits < 0))
+        self.counts['profit'] += int(np.sum(profits > 0))
+        self.counts['high_return'] += int(np.sum(returns > 0.3))
+        self.counts['breakeven'] += int(np.sum((profits >= 0) & (profits < 1000)))
+        self.counts['profit_over_1000'] += int(np.sum(profits >= 1000))
+        self.mortality_events += int(np.sum(n_mortality_events))
+
+    def merge(self, other: 'StreamingSummary'):
+        self.profit_moments.merge(other.profit_moments)
+        self.roi_moments.merge(other.roi_moments)
+        self.profit_sketch.merge(other.profit_sketch)
+        self.roi_sketch.merge(other.roi_sketch)
+        for key, value in other.counts.items():
+            self.counts[key] += value
+        self.mortality_events += other.mortality_events
+        for metric, moments in other.replicates.items():
+            self.replicates.setdefault(metric, RunningMoments()).merge(moments)
+        if other.fan_chart is not None:
+            if self.fan_chart is None:
+                self.fan_chart = FanChart()
+            self.fan_chart.merge(other.fan_chart)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Full accumulator state as plain arrays (for np.savez)"""
+        arrays = {'counts': np.array([self.counts[key] for key in sorted(self.counts)] + [self.mortality_events])}
+        for name in ('profit', 'roi'):
+            moments = getattr(self, f'{name}_moments')
+            sketch = getattr(self, f'{name}_sketch')
+            arrays[f'{name}_moments'] = np.array([moments.count, moments.mean, moments.m2, moments.min, moments.max])
+            arrays[f'{name}_sketch'] = np.array([sketch.relative_accuracy, sketch.max_buckets, sketch.min_value,
+                                                 sketch.zero_count, sketch.count,
+                                                 sketch.positive.offset, sketch.negative.offset])
+            arrays[f'{name}_positive'] = sketch.positive.counts
+            arrays[f'{name}_negative'] = sketch.negative.counts
+            arrays[f'{name}_folded'] = np.array([sketch.positive.folded, sketch.negative.folded])
+        if self.replicates:
+            arrays['replicates'] = np.array([[m.count, m.mean, m.m2, m.min, m.max]
+                                             for m in (self.replicates[k] for k in REPLICATE_METRICS)])
+        if self.fan_chart is not None:
+            arrays.update({f'fan.{key}': value for key, value in self.fan_chart.to_arrays().items()})
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays) -> 'StreamingSummary':
+        summary = cls()
+        *counts, summary.mortality_events = (int(v) for v in arrays['counts'])
+        summary.counts = dict(zip(sorted(summary.counts), counts))
+        for name in ('profit', 'roi'):
+            moments = getattr(summary, f'{name}_moments')
+            count, moments.mean, moments.m2, moments.min, moments.max = (float(v) for v in arrays[f'{name}_moments'])
+            moments.count = int(count)
+            accuracy, max_buckets, min_value, zero_count, n, positive, negative = arrays[f'{name}_sketch']
+            sketch = QuantileSketch(float(accuracy), int(max_buckets), float(min_value))
+            sketch.zero_count, sketch.count = int(zero_count), int(n)
+            sketch.positive.offset, sketch.positive.counts = int(positive), arrays[f'{name}_positive'].astype(np.int64)
+            sketch.negative.offset, sketch.negative.counts = int(negative), arrays[f'{name}_negative'].astype(np.int64)
+            if f'{name}_folded' in arrays:
+                sketch.positive.folded, sketch.negative.folded = (int(v) for v in arrays[f'{name}_folded'])
+            setattr(summary, f'{name}_sketch', sketch)
+        if 'replicates' in arrays:
+            for metric, row in zip(REPLICATE_METRICS, arrays['replicates']):
+                moments = summary.replicates[metric] = RunningMoments()
+                count, moments.mean, moments.m2, moments.min, moments.max = (float(v) for v in row)
+                moments.count = int(count)
+        fan = {key[4:]: value for key, value in arrays.items() if key.startswith('fan.')}
+        if fan:
+            summary.fan_chart = FanChart.from_arrays(fan)
+        return summary
+
+    def summary_stats(self) -> Dict:
+        n = self.count
+        profit, roi = self.profit_moments, self.roi_moments
+        standard_errors, iid = self.standard_errors(), self._iid_standard_errors()
+        p01, p05, p10, p25, p50, p75, p90 = self.profit_sketch.quantiles(
+            [0.01, 0.05, 0.10, 0.25, 0.50, 0.75, 0.90])
+        return {
+            'n_simulations': n,
+            'mean_profit': profit.mean,
+            'median_profit': float(p50),
+            'std_profit': profit.std,
+            'min_profit': profit.min,
+            'max_profit': profit.max,
+
+            'mean_roi': roi.mean,
+            'median_roi': self.roi_sketch.quantile(0.5),
+            'std_roi': roi.std,
+
+            'var_95': float(p05),
+            'var_99': float(p01),
+            'cvar_95': self.profit_sketch.tail_mean(0.05),
+            'cvar_99': self.profit_sketch.tail_mean(0.01),
+
+            'prob_loss': self.counts['loss'] / n,
+            'prob_profit': self.counts['profit'] / n,
+            'prob_high_return': self.counts['high_return'] / n,
+
+            'sharpe_ratio': roi.mean / roi.std if roi.std > 0 else 0,
+
+            'profit_p10': float(p10),
+            'profit_p25': float(p25),
+            'profit_p75': float(p75),
+            'profit_p90': float(p90),
+
+            # values folded by the quantile sketches; non-zero means the
+            # quantiles above may exceed the relative accuracy bound
+            'sketch_folded': {'profit': self.profit_sketch.folded, 'roi': self.roi_sketch.folded},
+
+            # scenarios are not kept, so antithetic pairing and control
+            # variates cannot be applied here; Sobol runs use shard replicates
+            'standard_errors': standard_errors,
+            'effective_sample_size': {
+                metric: float(n * (iid[metric] / se) ** 2) if se > 0 else float(n)
+                for metric, se in standard_errors.items()
+            },
+        }
+
+    def standard_errors(self) -> Dict:
+        """Standard errors from the spread of the shard replicates when
+        there are at least two, iid standard errors otherwise"""
+        if not self.replicates or self.replicates['mean_profit'].count < 2:
+            return self._iid_standard_errors()
+        return {metric: float(np.sqrt(self.replicates[metric].m2 / (r - 1) / r))
+                for metric, r in ((m, self.replicates[m].count) for m in REPLICATE_METRICS)}
+
+    def _iid_standard_errors(self) -> Dict:
+        n = self.count
+        prob_loss = self.counts['loss'] / n
+        standard_errors = {
+            'mean_profit': float(self.profit_moments.std / np.sqrt(n)),
+            'prob_loss': float(np.sqrt(prob_loss * (1 - prob_loss) / n)),
+        }
+        for metric, p in RISK_METRIC_LEVELS.items():
+            if metric.startswith('var'):
+                density = _density_at_quantile(self.profit_sketch.quantile, p, n)
+                standard_errors[metric] = float(np.sqrt(p * (1 - p) / n) / density)
+            else:
+                standard_errors[metric] = float(np.sqrt(self.profit_sketch.tail_excess_variance(p) / n) / p)
+        return standard_errors
+
+
+class ScenarioStore:
+    """Columnar scenario results: one array per scalar metric and one
+    (n_scenarios, time_steps + 1) array per path type"""
+
+    SCALAR_COLUMNS = ('simulation_id', 'site_id', 'species', 'survival_rate',
+                      'n_mortality_events', 'final_price', 'final_weight_kg',
+                      'total_biomass_kg', 'surviving_fish', 'revenue', 'total_cost',
+                      'profit', 'roi', 'profit_margin')
+    PATH_COLUMNS = ('price_path', 'weight_path', 'cost_path')
+
+    def __init__(self,
+                 columns: Optional[Dict[str, np.ndarray]] = None,
+                 paths: Optional[Dict[str, np.ndarray]] = None):
+        self.columns = columns or {}
+        self.paths = paths or {}
+
+    @classmethod
+    def from_batches(cls,
+                     batches: List[Dict[str, np.ndarray]],
+                     site_params: Dict,
+                     keep_paths: bool = True) -> 'ScenarioStore':
+        def column(key):
+            return np.concatenate([b[key] for b in batches])
+
+        n = sum(len(b['profit']) for b in batches)
+        columns = {
+            'simulation_id': np.arange(n),
+            'site_id': np.full(n, site_params['site_id']),
+            'species': np.full(n, site_params['species']),
+        }
+        for key in cls.SCALAR_COLUMNS[3:]:
+            columns[key] = column(key)
+        paths = {key: column(key) for key in cls.PATH_COLUMNS} if keep_paths else {}
+        return cls(columns, paths)
+
+    def __len__(self) -> int:
+        return len(self.columns.get('profit', ()))
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        if key in self.columns:
+            return self.columns[key]
+        return self.paths[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.columns or key in self.paths
+
+    @property
+    def has_paths(self) -> bool:
+        return bool(self.paths)
+
+    def to_dataframe(self, include_paths: bool = False) -> pd.DataFrame:
+        """Scalar columns as a DataFrame; include_paths adds object columns
+        holding one row view per scenario, i.e. n small objects per path type"""
+        df = pd.DataFrame(self.columns)
+        if include_paths:
+            # one row view per scenario; the floats stay in the 2-D arrays
+            for key, values in self.paths.items():
+                df[key] = list(values)
+        return df
+
+    def records(self, include_paths: bool = False) -> List[Dict]:
+        """Plain Python rows for JSON export, converted column by column"""
+        if include_paths and not self.has_paths:
+            raise ValueError("Scenario paths were not kept for this run (keep_paths=False)")
+        names = list(self.columns)
+        values = [self.columns[k].tolist() for k in names]
+        if include_paths:
+            names += list(self.paths)
+            values += [self.paths[k].tolist() for k in self.paths]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+
+class ScenarioIndex:
+    """Profit ordering of a run, built once when results are produced: the
+    ascending order and sorted profit array, plus the k best and worst
+    scenarios overall and per site_id / species value, so reports and
+    dashboards never sort at request time"""
+
+    GROUP_COLUMNS = ('site_id', 'species')
+
+    def __init__(self,
+                 order: np.ndarray,
+                 sorted_profit: np.ndarray,
+                 groups: Optional[Dict[str, Dict[str, np.ndarray]]] = None):
+        self.order = order
+        self.sorted_profit = sorted_profit
+        # column -> {'values', 'codes', 'best', 'worst'}; best/worst rows are
+        # padded with -1 for groups smaller than k
+        self.groups = groups or {}
+
+    @classmethod
+    def build(cls, columns: Dict[str, np.ndarray], k: int = 100) -> 'ScenarioIndex':
+        profit = columns['profit']
+        order = np.argsort(profit, kind='stable')
+        groups = {}
+        for column in cls.GROUP_COLUMNS:
+            if column not in columns:
+                continue
+            values, codes = np.unique(columns[column], return_inverse=True)
+            codes = codes.ravel().astype(np.int32)
+            # a stable sort by group keeps each group's scenarios in profit order
+            grouped = order[np.argsort(codes[order], kind='stable')]
+            bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(values)))])
+            best = np.full((len(values), k), -1, dtype=np.int64)
+            worst = np.full((len(values), k), -1, dtype=np.int64)
+            for g in range(len(values)):
+                members = grouped[bounds[g]:bounds[g + 1]]
+                worst[g, :min(k, len(members))] = members[:k]
+                best[g, :min(k, len(members))] = members[::-1][:k]
+            groups[column] = {'values': values, 'codes': codes, 'best': best, 'worst': worst}
+        return cls(order, profit[order], groups)
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def percentiles(self, levels) -> np.ndarray:
+        """np.percentile(profit, levels) (linear interpolation) read off the sorted array"""
+        return _sorted_percentiles(self.sorted_profit, levels)
+
+    def count_below(self, value: float, inclusive: bool = False) -> int:
+        """Number of scenarios with profit < value (<= when inclusive)"""
+        return int(np.searchsorted(self.sorted_profit, value, side='right' if inclusive else 'left'))
+
+    def best(self, k: int = 10, **filters) -> np.ndarray:
+        """Scenario indices of the k highest profits, optionally within
+        site_id / species values, e.g. best(10, species='Salmon')"""
+        return self._extreme('best', k, filters)
+
+    def worst(self, k: int = 10, **filters) -> np.ndarray:
+        """Scenario indices of the k lowest profits, worst first"""
+        return self._extreme('worst', k, filters)
+
+    def _group_code(self, column: str, value) -> int:
+        if column not in self.groups:
+            raise ValueError(f"Scenarios are indexed by {sorted(self.groups)}, not {column!r}")
+        # compare as strings so query-string values match numeric ids
+        matches = np.flatnonzero(self.groups[column]['values'].astype(str) == str(value))
+        return int(matches[0]) if len(matches) else -1
+
+    def _extreme(self, side: str, k: int, filters: Dict) -> np.ndarray:
+        if not filters:
+            return self.order[::-1][:k] if side == 'best' else self.order[:k]
+        codes = {column: self._group_code(column, value) for column, value in filters.items()}
+        if any(code < 0 for code in codes.values()):
+            return np.empty(0, dtype=np.int64)
+        if len(codes) == 1:
+            (column, code), = codes.items()
+            row = self.groups[column][side][code]
+            if k <= len(row):
+                row = row[:k]
+                return row[row >= 0]
+        # several filters, or more than the precomputed k: one pass over the
+        # stored order, still without sorting
+        ordered = self.order[::-1] if side == 'best' else self.order
+        mask = np.ones(len(ordered), dtype=bool)
+        for column, code in codes.items():
+            mask &= self.groups[column]['codes'][ordered] == code
+        return ordered[mask][:k]
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        arrays = {'order': self.order, 'sorted_profit': self.sorted_profit}
+        for column, group in self.groups.items():
+            arrays.update({f'{column}.{key}': value for key, value in group.items()})
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> 'ScenarioIndex':
+        groups = {}
+        for key, value in arrays.items():
+            column, _, name = key.partition('.')
+            if name:
+                groups.setdefault(column, {})[name] = value
+        return cls(arrays['order'], arrays['sorted_profit'], groups)
+
+
+class PathArchive:
+    """Scenario columns and full paths stored as .npy files in one directory
+    and opened lazily as memory maps, so runs larger than RAM can be sliced
+    by scenario or timestep without reading the rest"""
+
+    MANIFEST = 'manifest.json'
+    METRIC_COLUMNS = ScenarioStore.SCALAR_COLUMNS[3:]
+    INT_COLUMNS = ('n_mortality_events', 'surviving_fish')
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, self.MANIFEST), 'r') as f:
+            self.manifest = json.load(f)
+        self.n_scenarios = self.manifest['n_scenarios']
+        self.time_steps = self.manifest['time_steps']
+        self._arrays = {}
+
+    @classmethod
+    def create(cls, directory: str, n_scenarios: int, time_steps: int, path_dtype=np.float64):
+        """Preallocate one memory-mapped file per column and path type"""
+        os.makedirs(directory, exist_ok=True)
+        for key in cls.METRIC_COLUMNS:
+            dtype = np.int64 if key in cls.INT_COLUMNS else np.float64
+            np.lib.format.open_memmap(os.path.join(directory, f'{key}.npy'), mode='w+',
+                                      dtype=dtype, shape=(n_scenarios,))
+        for key in ScenarioStore.PATH_COLUMNS:
+            np.lib.format.open_memmap(os.path.join(directory, f'{key}.npy'), mode='w+',
+                                      dtype=path_dtype, shape=(n_scenarios, time_steps + 1))
+        cls._write_manifest(directory, {'n_scenarios': 0, 'allocated': n_scenarios,
+                                        'time_steps': time_steps, 'complete': False})
+
+    @classmethod
+    def write_shard(cls, directory: str, start: int, batch: Dict[str, np.ndarray]):
+        """Write one shard's rows in place; the path arrays are dropped from
+        the batch so they are never held past this point"""
+        stop = start + len(batch['profit'])
+        for key in cls.METRIC_COLUMNS + ScenarioStore.PATH_COLUMNS:
+            target = np.load(os.path.join(directory, f'{key}.npy'), mmap_mode='r+')
+            target[start:stop] = batch[key]
+            target.flush()
+            del target
+        for key in ScenarioStore.PATH_COLUMNS:
+            batch.pop(key)
+
+    @classmethod
+    def finalize(cls, directory: str, n_scenarios: int, metadata: Dict):
+        with open(os.path.join(directory, cls.MANIFEST), 'r') as f:
+            manifest = json.load(f)
+        manifest.update({'n_scenarios': n_scenarios, 'complete': True, 'metadata': metadata})
+        cls._write_manifest(directory, manifest)
+
+    @classmethod
+    def _write_manifest(cls, directory: str, manifest: Dict):
+        with open(os.path.join(directory, cls.MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+    def _array(self, key: str) -> np.ndarray:
+        if key not in self._arrays:
+            data = np.load(os.path.join(self.directory, f'{key}.npy'), mmap_mode='r')
+            # files are sized for the budget; only the first n_scenarios rows are valid
+            self._arrays[key] = data[:self.n_scenarios]
+        return self._arrays[key]
+
+    def column(self, key: str) -> np.ndarray:
+        return self._array(key)
+
+    def paths(self, kind: str) -> np.ndarray:
+        """Read-only (n_scenarios, time_steps + 1) memory map for one path type"""
+        return self._array(kind)
+
+    def scenarios(self,
+                  indices,
+                  kinds: Tuple[str, ...] = ScenarioStore.PATH_COLUMNS) -> Dict[str, np.ndarray]:
+        """Full paths for the given scenario indices, in the order given"""
+        indices = np.asarray(indices, dtype=np.int64)
+        # read rows in file order, then restore the requested order
+        order = np.argsort(indices, kind='stable')
+        inverse = np.empty_like(order)
+        inverse[order] = np.arange(len(order))
+        return {kind: self.paths(kind)[indices[order]][inverse] for kind in kinds}
+
+    def timestep(self,
+                 t: int,
+                 kinds: Tuple[str, ...] = ScenarioStore.PATH_COLUMNS) -> Dict[str, np.ndarray]:
+        """Cross-section of every scenario at timestep t"""
+        return {kind: np.array(self.paths(kind)[:, t]) for kind in kinds}
+
+    def worst(self, k: int = 100, by: str = 'profit') -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Indices (worst first) and full paths of the k lowest scenarios by column"""
+        values = self.column(by)
+        k = min(k, len(values))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), self.scenarios([])
+        idx = np.argpartition(values, k - 1)[:k]
+        idx = idx[np.argsort(values[idx], kind='stable')]
+        return idx, self.scenarios(idx)
+
+    def best(self, k: int = 100, by: str = 'profit') -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Indices (best first) and full paths of the k highest scenarios by column"""
+        values = self.column(by)
+        k = min(k, len(values))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), self.scenarios([])
+        idx = np.argpartition(values, len(values) - k)[len(values) - k:]
+        idx = idx[np.argsort(-values[idx], kind='stable')]
+        return idx, self.scenarios(idx)
+
+
+def _json_default(value):
+    """json.dumps fallback for NumPy values inside parameter dicts"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class ResultCache:
+    """On-disk cache of simulation results in write_to_npz format, keyed by
+    a hash of the simulator config and parameter dicts. Entries are evicted
+    least recently used first once their total size exceeds max_bytes; an
+    entry larger than max_bytes on its own is not stored.
+
+    The directory can be shared between processes: index updates are made
+    under a lock file (where fcntl is available), and .npz files missing
+    from the index are adopted on load so they still count towards the
+    size bound."""
+
+    INDEX = 'index.json'
+    LOCK = 'index.lock'
+    VERSION = 1
+
+    def __init__(self, directory: str, max_bytes: int = 1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.skipped = 0
+        os.makedirs(directory, exist_ok=True)
+        with self._locked():
+            pass
+
+    @classmethod
+    def key(cls, *parts) -> str:
+        """Stable hash of JSON-serialisable parts (dicts are key-order independent)"""
+        payload = json.dumps([cls.VERSION, NPZ_FORMAT_VERSION, *parts], sort_keys=True, default=_json_default)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.npz')
+
+    @contextmanager
+    def _locked(self):
+        """Hold the directory lock and a freshly loaded index"""
+        with open(os.path.join(self.directory, self.LOCK), 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._load_index()
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _load_index(self):
+        # re-read on every operation so caches sharing a directory stay in step
+        index_path = os.path.join(self.directory, self.INDEX)
+        self._index = {'clock': 0, 'entries': {}}
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                self._index = json.load(f)
+        entries = self._index['entries']
+        # drop entries whose file has gone missing
+        for key in [k for k in entries if not os.path.exists(self._path(k))]:
+            del entries[key]
+        # adopt files whose index update was lost, as least recently used
+        for name in os.listdir(self.directory):
+            key, ext = os.path.splitext(name)
+            if ext == '.npz' and key not in entries:
+                path = os.path.join(self.directory, name)
+                entries[key] = {'size': os.path.getsize(path),
+                                'created_at': datetime.fromtimestamp(os.path.getmtime(path)).isoformat(),
+                                'last_used': 0}
+
+    def _touch(self, key: str):
+        self._index['clock'] += 1
+        self._index['entries'][key]['last_used'] = self._index['clock']
+
+    def _save_index(self):
+        tmp = os.path.join(self.directory, self.INDEX + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self._index, f, indent=2)
+        os.replace(tmp, os.path.join(self.directory, self.INDEX))
+
+    def __contains__(self, key: str) -> bool:
+        with self._locked():
+            return key in self._index['entries']
+
+    def get(self, key: str, include_paths: bool = True) -> Optional[Dict]:
+        """Results as returned by read_results_npz, or None on a miss"""
+        with self._locked():
+            if key not in self._index['entries']:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touch(key)
+            self._save_index()
+            return read_results_npz(self._path(key), include_paths=include_paths)
+
+    def put(self, key: str, arrays: Dict[str, np.ndarray]) -> bool:
+        """Store write_to_npz style arrays under key, evicting older entries
+        until it fits. Returns False, leaving the cache untouched, when the
+        entry alone is larger than max_bytes."""
+        # the temporary file is unique per process, so writes can overlap
+        tmp = f'{self._path(key)}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, **arrays)
+        size = os.path.getsize(tmp)
+        if size > self.max_bytes:
+            os.remove(tmp)
+            self.skipped += 1
+            warnings.warn(f"Result of {size} bytes exceeds the cache limit of {self.max_bytes} "
+                          f"bytes and was not cached", RuntimeWarning, stacklevel=2)
+            return False
+        with self._locked():
+            self._index['entries'].pop(key, None)
+            self._evict(self.max_bytes - size)
+            os.replace(tmp, self._path(key))
+            self._index['entries'][key] = {'size': size, 'created_at': datetime.now().isoformat()}
+            self._touch(key)
+            self._save_index()
+        return True
+
+    def _evict(self, max_bytes: int):
+        entries = self._index['entries']
+        for key in sorted(entries, key=lambda k: entries[k]['last_used']):
+            if self.size <= max_bytes:
+                break
+            self._remove(key)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        del self._index['entries'][key]
+        if os.path.exists(self._path(key)):
+            os.remove(self._path(key))
+
+    def invalidate(self, key: Optional[str] = None) -> int:
+        """Drop one entry, or every entry when key is None; returns the number removed"""
+        with self._locked():
+            keys = list(self._index['entries']) if key is None else [key] if key in self._index['entries'] else []
+            for k in keys:
+                self._remove(k)
+            self._save_index()
+        return len(keys)
+
+    @property
+    def size(self) -> int:
+        return sum(entry['size'] for entry in self._index['entries'].values())
+
+    def stats(self) -> Dict:
+        with self._locked():
+            lookups = self.hits + self.misses
+            return {'entries': len(self._index['entries']),
+                    'bytes': self.size,
+                    'max_bytes': self.max_bytes,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+                    'skipped': self.skipped,
+                    'hit_rate': self.hits / lookups if lookups else 0.0}
+
+
+class RunCheckpoint:
+    """Per-shard checkpoint of a batched run. Each finished shard is saved
+    to its own .npz (scenario columns, or StreamingSummary state for
+    streaming runs) and recorded in a manifest with the seed it was drawn
+    from, so an interrupted run resumes where it stopped and a finished one
+    can be extended without recomputing the shards it already has."""
+
+    MANIFEST = 'checkpoint.json'
+    VERSION = 1
+
+    def __init__(self, directory: str, config: Dict, entropy: int, fixed_seed: bool):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.MANIFEST)
+        if os.path.exists(path):
+            with open(path) as f:
+                self.manifest = json.load(f)
+            if self.manifest['config'] != json.loads(json.dumps(config, default=_json_default)):
+                raise ValueError(f"Checkpoint in {directory} was written with different settings")
+            if fixed_seed and self.manifest['entropy'] != entropy:
+                raise ValueError(f"Checkpoint in {directory} was written with a different random_seed")
+        else:
+            self.manifest = {'version': self.VERSION,
+                             'config': json.loads(json.dumps(config, default=_json_default)),
+                             'entropy': entropy,
+                             'shards': {}}
+            self._save()
+
+    @property
+    def entropy(self) -> int:
+        return self.manifest['entropy']
+
+    @classmethod
+    def shard_path(cls, directory: str, start: int) -> str:
+        return os.path.join(directory, f'shard_{start:012d}.npz')
+
+    @classmethod
+    def write_shard(cls, directory: str, start: int, result):
+        """Save one shard result; runs inside the worker that produced it"""
+        if isinstance(result, StreamingSummary):
+            arrays = {f'summary.{key}': value for key, value in result.to_arrays().items()}
+        else:
+            arrays = {f'batch.{key}': value for key, value in result.items() if key != 'fan_chart'}
+            if 'fan_chart' in result:
+                arrays.update({f'fan.{key}': value for key, value in result['fan_chart'].to_arrays().items()})
+        tmp = cls.shard_path(directory, start) + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, cls.shard_path(directory, start))
+
+    def has(self, shard: Tuple[int, int, int]) -> bool:
+        # a trailing partial shard of an earlier, shorter run has other draws
+        # than the full shard and is simulated again
+        index, start, n_paths = shard
+        record = self.manifest['shards'].get(str(index))
+        return record is not None and record['n_paths'] == n_paths and record['start'] == start
+
+    def load(self, shard: Tuple[int, int, int]):
+        with np.load(self.shard_path(self.directory, shard[1]), allow_pickle=False) as data:
+            groups = {}
+            for key in data.files:
+                group, _, name = key.partition('.')
+                groups.setdefault(group, {})[name] = data[key]
+        if 'summary' in groups:
+            return StreamingSummary.from_arrays(groups['summary'])
+        if 'fan' in groups:
+            groups['batch']['fan_chart'] = FanChart.from_arrays(groups['fan'])
+        return groups['batch']
+
+    def record(self, shard: Tuple[int, int, int]):
+        index, start, n_paths = shard
+        self.manifest['shards'][str(index)] = {
+            'start': start,
+            'n_paths': n_paths,
+            # the shard's generator is default_rng(SeedSequence(entropy, spawn_key))
+            'spawn_key': [index],
+            'completed_at': datetime.now().isoformat()
+        }
+        self._save()
+
+    def _save(self):
+        path = os.path.join(self.directory, self.MANIFEST)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(path + '.tmp', path)
 
 
 class MonteCarlo_Simulation:
+    SAMPLING_MODES = ('pseudo', 'antithetic', 'sobol')
+    PATH_DTYPES = (np.float32, np.float64)
+
     def __init__(self,
                  n_simulations: int = 10000,
                  time_horizon_days: int = 180,
                  time_steps: int = 60,
-                 random_seed: Optional[int] = 42):
+                 random_seed: Optional[int] = 42,
+                 sampling: str = 'pseudo',
+                 control_variate: bool = False,
+                 path_dtype=np.float64):
+        if sampling not in self.SAMPLING_MODES:
+            raise ValueError(f"sampling must be one of {self.SAMPLING_MODES}, got {sampling!r}")
+        if np.dtype(path_dtype) not in self.PATH_DTYPES:
+            raise ValueError(f"path_dtype must be float32 or float64, got {np.dtype(path_dtype)}")
         self.n_simulations = n_simulations
         self.time_horizon_days = time_horizon_days
         self.time_steps = time_steps
         self.dt = time_horizon_days / time_steps
 
+        self.random_seed = random_seed
+
+        # the scalar engine draws from the global state; the vectorized engine
+        # gives every shard its own generator spawned from this seed sequence
         if random_seed is not None:
             np.random.seed(random_seed)
+        self.seed_sequence = np.random.SeedSequence(random_seed)
+
+        # variance reduction (vectorized engine): antithetic or scrambled
+        # Sobol price/cost increments and a terminal-price control variate
+        self.sampling = sampling
+        self.control_variate = control_variate
+        self.control_mean = None
+
+        # dtype the vectorized engine draws, evolves and stores paths in.
+        # float32 halves path memory and bandwidth; totals are still summed in
+        # float64, so with unit roundoff u = 2**-24 every path value (relative
+        # to the largest value on its path), final price/weight and total cost
+        # is within 2 * (time_steps + 1) * u (7.3e-6 at 60 steps) of the float64
+        # result on the same draws, and |profit error| <= that bound *
+        # (revenue + total_cost); the float64 path draws are unchanged
+        self.path_dtype = np.dtype(path_dtype)
 
         # storage for simulations results
-        self.scenarios = []
+        self.scenarios = ScenarioStore()
         self.summary_stats = {}
+        self.streaming_summary = None
+        self.adaptive_run = None
+        self.portfolio_results = None
+        self.cohort_results = None
+        self.sweep_results = None
+        self.fan_charts = None
+        self.site_params = None
+        self.stress_results = None
+        self.harvest_results = None
+        self.scenario_index = None
 
     def simulate_price_path_gbm(self,
                                 S0: float,
@@ -71,6 +1389,67 @@ class MonteCarlo_Simulation:
             C[t + 1] = C[t] + theta * (mu - C[t]) * self.dt + sigma * dW
             C[t + 1] = max(C[t + 1], 0)
         return C 
+
+    # Batched path generators: every scenario is simulated at once and the
+    # time axis is the last axis, shape (n_paths, time_steps + 1).
+    def _path_shape(self, n_paths) -> Tuple[int, ...]:
+        """(n_paths, time_steps), or (*n_paths, time_steps) for a batch of units"""
+        return tuple(np.atleast_1d(n_paths)) + (self.time_steps,)
+
+    def _normal(self, rng, shape, scale: float = 1.0) -> np.ndarray:
+        """N(0, scale^2) draws in self.path_dtype; float64 keeps the original streams"""
+        if self.path_dtype == np.float64:
+            return rng.normal(0, scale, shape)
+        if isinstance(rng, np.random.Generator):
+            # float32 variates are drawn natively, never materialized as float64
+            z = rng.standard_normal(shape, dtype=self.path_dtype)
+            z *= self.path_dtype.type(scale)
+            return z
+        return rng.normal(0, scale, shape).astype(self.path_dtype)
+
+    def simulate_price_paths_gbm(self,
+                                 S0: float,
+                                 mu: float,
+                                 sigma: float,
+                                 n_paths: int,
+                                 rng=np.random,
+                                 dW: Optional[np.ndarray] = None) -> np.ndarray:
+        if dW is None:
+            dW = self._normal(rng, self._path_shape(n_paths), np.sqrt(self.dt))
+        return gbm_paths(S0, mu, sigma, dW, self.dt)
+
+    def simulate_growth_paths_jump_diffusion(self,
+                                             W0: float,
+                                             growth_rate: float,
+                                             growth_vol: float,
+                                             jump_intensity: float,
+                                             jump_mean: float,
+                                             jump_std: float,
+                                             n_paths: int,
+                                             rng=np.random,
+                                             jumps: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        shape = self._path_shape(n_paths)
+        dW = self._normal(rng, shape, np.sqrt(self.dt))
+        if jumps is None:
+            # Only whether a step has at least one Poisson arrival matters, so the
+            # count is replaced by a Bernoulli draw with P(N > 0) = 1 - exp(-lambda*dt)
+            jumps = rng.random(shape) < -np.expm1(-_per_path(jump_intensity) * self.dt)
+        jump_z = self._normal(rng, shape)
+        W = jump_diffusion_paths(W0, growth_rate, growth_vol, jump_mean, jump_std,
+                                 dW, jumps, jump_z, self.dt)
+        return W, jumps.sum(axis=-1)
+
+    def simulate_cost_paths_ou(self,
+                               C0: float,
+                               theta: float,
+                               mu: float,
+                               sigma: float,
+                               n_paths: int,
+                               rng=np.random,
+                               dW: Optional[np.ndarray] = None) -> np.ndarray:
+        if dW is None:
+            dW = self._normal(rng, self._path_shape(n_paths), np.sqrt(self.dt))
+        return ou_paths(C0, theta, mu, sigma, dW, self.dt)
     
     def calculate_financial_metrics(self,
                                     price_path: np.ndarray,
@@ -99,14 +1478,502 @@ class MonteCarlo_Simulation:
             'total_biomass_kg': total_biomass_kg,
             'surviving_fish': surviving_fish
         }
-    
+
+    def calculate_financial_metrics_batch(self,
+                                          price_paths: np.ndarray,
+                                          weight_paths: np.ndarray,
+                                          cost_paths: np.ndarray,
+                                          n_fish: int,
+                                          survival_rates: np.ndarray) -> Dict[str, np.ndarray]:
+        """Array version of calculate_financial_metrics over a batch of paths
+        (time on the last axis; n_fish may be per unit). Paths may be float32,
+        but every metric is computed and accumulated in float64."""
+        final_weight_kg = weight_paths[..., -1].astype(np.float64) / 1000
+        final_price = price_paths[..., -1].astype(np.float64)
+        surviving_fish = np.floor(n_fish * survival_rates).astype(np.int64)
+        total_biomass_kg = surviving_fish * final_weight_kg
+        revenue = total_biomass_kg * final_price
+        total_cost = np.sum(cost_paths, axis=-1, dtype=np.float64)
+        profit = revenue - total_cost
+        with np.errstate(divide='ignore', invalid='ignore'):
+            roi = np.where(total_cost > 0, profit / total_cost, 0.0)
+            profit_margin = np.where(revenue > 0, profit / revenue, 0.0)
+
+        return {
+            'revenue': revenue,
+            'total_cost': total_cost,
+            'profit': profit,
+            'roi': roi,
+            'profit_margin': profit_margin,
+            'final_price': final_price,
+            'final_weight_kg': final_weight_kg,
+            'total_biomass_kg': total_biomass_kg,
+            'surviving_fish': surviving_fish
+        }
+
+    def brownian_increments(self, n_paths: int, rng=np.random) -> Tuple[np.ndarray, np.ndarray]:
+        """dW for the price (GBM) and cost (OU) processes under self.sampling"""
+        shape = (n_paths, self.time_steps)
+        if self.sampling == 'antithetic':
+            # rows 2k and 2k+1 are mirrored pairs (Z, -Z)
+            half = (n_paths + 1) // 2
+            z = self._normal(rng, (2, half, self.time_steps), np.sqrt(self.dt))
+            dW = np.empty((2,) + shape, dtype=self.path_dtype)
+            dW[:, 0::2] = z
+            dW[:, 1::2] = -z[:, :n_paths // 2]
+            return dW[0], dW[1]
+        if self.sampling == 'sobol':
+            # one scrambled Sobol point per path; price and cost dimensions are
+            # interleaved so both get the best-distributed leading coordinates
+            sampler = qmc.Sobol(2 * self.time_steps, scramble=True, rng=rng)
+            with warnings.catch_warnings():
+                # only a trailing shard can have a non power-of-two size
+                warnings.simplefilter('ignore', UserWarning)
+                u = sampler.random(n_paths)
+            z = norm.ppf(np.clip(u, 1e-12, 1 - 1e-12))
+            return (brownian_bridge_increments(z[:, 0::2], self.dt).astype(self.path_dtype, copy=False),
+                    brownian_bridge_increments(z[:, 1::2], self.dt).astype(self.path_dtype, copy=False))
+        return self._normal(rng, shape, np.sqrt(self.dt)), self._normal(rng, shape, np.sqrt(self.dt))
+
+    def expected_terminal_price(self, market_params: Dict) -> float:
+        """Analytic GBM mean E[S_T] = S0 * exp(mu * T), used as control variate"""
+        return market_params['initial_price'] * np.exp(market_params['drift'] / 365 * self.time_horizon_days)
+
+    def _simulate_batch(self,
+                        n_paths: int,
+                        site_params: Dict,
+                        market_params: Dict,
+                        growth_params: Dict,
+                        cost_params: Dict,
+                        rng=np.random) -> Dict[str, np.ndarray]:
+        dW_price, dW_cost = self.brownian_increments(n_paths, rng)
+        price_paths = self.simulate_price_paths_gbm(
+            market_params['initial_price'],
+            market_params['drift'],
+            market_params['volatility'],
+            n_paths, rng, dW=dW_price
+        )
+
+        weight_paths, n_jumps = self.simulate_growth_paths_jump_diffusion(
+            site_params['initial_weight'],
+            growth_params['growth_rate'],
+            growth_params['growth_vol'],
+            growth_params['jump_intensity'],
+            growth_params['jump_mean'],
+            growth_params['jump_std'],
+            n_paths, rng
+        )
+
+        cost_paths = self.simulate_cost_paths_ou(
+            cost_params['initial_cost'],
+            cost_params['theta'],
+            cost_params['mean_cost'],
+            cost_params['sigma'],
+            n_paths, rng, dW=dW_cost
+        )
+
+        survival_rates = np.maximum(growth_params['base_survival'] - n_jumps * 0.05, 0.5)
+        metrics = self.calculate_financial_metrics_batch(
+            price_paths,
+            weight_paths,
+            cost_paths,
+            site_params['n_fish'],
+            survival_rates
+        )
+        metrics.update({
+            'survival_rate': survival_rates,
+            'n_mortality_events': n_jumps,
+            'price_path': price_paths,
+            'weight_path': weight_paths,
+            'cost_path': cost_paths
+        })
+        return metrics
+
+    def shard_generator(self, shard_index: int) -> np.random.Generator:
+        """Independent generator for one shard, derived from the master seed"""
+        child = np.random.SeedSequence(self.seed_sequence.entropy, spawn_key=(shard_index,))
+        return np.random.default_rng(child)
+
+    @property
+    def n_completed(self) -> int:
+        """Scenarios simulated by the last run; below n_simulations (the
+        budget) when a precision-driven run stopped early"""
+        if self.adaptive_run is not None:
+            return self.adaptive_run['n_simulations']
+        return self.n_simulations
+
+    def _worker_config(self) -> Dict:
+        """Constructor arguments needed to rebuild this simulator in a worker"""
+        return {
+            'n_simulations': self.n_simulations,
+            'time_horizon_days': self.time_horizon_days,
+            'time_steps': self.time_steps,
+            'random_seed': None,
+            'sampling': self.sampling,
+            'control_variate': self.control_variate,
+            'path_dtype': self.path_dtype.name
+        }
+
+    def _replicate_size(self, batch_size: int) -> Optional[int]:
+        """Rows per independently scrambled Sobol shard, whose spread gives
+        the standard errors; None when rows are iid or antithetic pairs"""
+        return batch_size if self.sampling == 'sobol' else None
+
+    def _shard_size(self, batch_size: int) -> int:
+        """Round batch_size to what the sampling mode needs: antithetic pairs
+        must not straddle a shard boundary, and Sobol shards are balanced
+        only at power-of-two sizes"""
+        if self.sampling != 'pseudo':
+            batch_size += batch_size % 2
+        if self.sampling == 'sobol':
+            batch_size = 1 << (batch_size - 1).bit_length()
+        return batch_size
+
+    def _shard_plan(self, batch_size: int, stop: int, start: int = 0) -> List[Tuple[int, int, int]]:
+        """(shard_index, first_scenario, n_paths) for scenarios [start, stop);
+        start must be a multiple of batch_size"""
+        return [(offset // batch_size, offset, min(batch_size, stop - offset))
+                for offset in range(start, stop, batch_size)]
+
+    def _iter_shards(self,
+                     site_params: Dict,
+                     market_params: Dict,
+                     growth_params: Dict,
+                     cost_params: Dict,
+                     shards: List[Tuple[int, int, int]],
+                     n_workers: Optional[int] = 1,
+                     options: Optional[Dict] = None):
+        """Yield shard results in shard order: raw batches, or one
+        StreamingSummary per shard when options['streaming'] is set"""
+        # Shards are fixed by batch_size and seeded by their index, so the
+        # merged result does not depend on how many workers ran them
+        params = (site_params, market_params, growth_params, cost_params)
+
+        if n_workers is None:
+            n_workers = os.cpu_count() or 1
+        n_workers = min(n_workers, len(shards))
+
+        if n_workers > 1:
+            print(f"  Dispatching {len(shards)} shards to {n_workers} worker processes")
+            config = self._worker_config()
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                results = executor.map(
+                    _simulate_shard,
+                    [config] * len(shards),
+                    [self.shard_generator(i) for i, _, _ in shards],
+                    [start for _, start, _ in shards],
+                    [n for _, _, n in shards],
+                    [params] * len(shards),
+                    [options] * len(shards)
+                )
+                for (_, start, n_paths), result in zip(shards, results):
+                    print(f"  Completed {start + n_paths}/{self.n_simulations} simulations")
+                    yield result
+        else:
+            for i, start, n_paths in shards:
+                result = _process_shard(self, self.shard_generator(i), start, n_paths, params, options)
+                print(f"  Completed {start + n_paths}/{self.n_simulations} simulations")
+                yield result
+
+    def _iter_checkpointed_shards(self,
+                                  site_params: Dict,
+                                  market_params: Dict,
+                                  growth_params: Dict,
+                                  cost_params: Dict,
+                                  checkpoint: RunCheckpoint,
+                                  batch_size: int,
+                                  n_workers: Optional[int] = 1,
+                                  options: Optional[Dict] = None):
+        """Like _iter_shards over the full plan, but shards already in the
+        checkpoint are loaded and only the rest are simulated (and saved)"""
+        plan = self._shard_plan(batch_size, self.n_simulations)
+        pending = [shard for shard in plan if not checkpoint.has(shard)]
+        if len(pending) < len(plan):
+            done = sum(shard[2] for shard in plan if checkpoint.has(shard))
+            print(f"  Resuming from checkpoint: {done}/{self.n_simulations} simulations already done")
+        fresh = self._iter_shards(site_params, market_params, growth_params, cost_params,
+                                  pending, n_workers, options)
+        for shard in plan:
+            if checkpoint.has(shard):
+                yield checkpoint.load(shard)
+            else:
+                result = next(fresh)
+                checkpoint.record(shard)
+                yield result
+
+    def _run_until_precision(self,
+                             site_params: Dict,
+                             market_params: Dict,
+                             growth_params: Dict,
+                             cost_params: Dict,
+                             tolerances: Dict[str, float],
+                             confidence: float,
+                             batch_size: int,
+                             n_workers: Optional[int],
+                             options: Dict) -> List:
+        """Simulate rounds of shards until the confidence-interval half-width
+        of every metric in tolerances is within its tolerance, or until
+        n_simulations (the budget) is used up"""
+        unknown = set(tolerances) - {'mean_profit', 'prob_loss', *RISK_METRIC_LEVELS}
+        if unknown:
+            raise ValueError(f"No standard error available for {sorted(unknown)}")
+
+        z = float(norm.ppf(0.5 + confidence / 2))
+        budget = self.n_simulations
+        round_size = batch_size * (n_workers or os.cpu_count() or 1)
+        params = (site_params, market_params, growth_params, cost_params)
+        streaming = options.get('streaming', False)
+        results, summary = [], StreamingSummary()
+        done, n_batches = 0, 0
+        precision, converged = {}, False
+
+        while done < budget and not converged:
+            shards = self._shard_plan(batch_size, min(done + round_size, budget), done)
+            for result in self._iter_shards(*params, shards, n_workers, options):
+                # streaming shards are folded in as they arrive, so memory
+                # stays constant however many rounds are needed
+                if streaming:
+                    summary.merge(result)
+                else:
+                    results.append(result)
+            done = shards[-1][1] + shards[-1][2]
+            n_batches += len(shards)
+
+            if streaming:
+                standard_errors = summary.standard_errors()
+            else:
+                profits = np.concatenate([b['profit'] for b in results])
+                control = None
+                if self.control_mean is not None:
+                    control = np.concatenate([b['final_price'] for b in results]) - self.control_mean
+                _, standard_errors, _ = risk_metric_estimates(
+                    profits, paired=self.sampling == 'antithetic', control=control,
+                    replicate_size=self._replicate_size(batch_size))
+            precision = {metric: z * standard_errors[metric] for metric in tolerances}
+            converged = all(precision[m] <= tol for m, tol in tolerances.items())
+            print(f"  {done} simulations: " +
+                  ", ".join(f"{m} ±{precision[m]:,.4g}" for m in tolerances))
+
+        self.adaptive_run = {
+            'batches': n_batches,
+            'batch_size': batch_size,
+            'n_simulations': done,
+            'budget': budget,
+            'converged': converged,
+            'confidence': confidence,
+            'tolerances': dict(tolerances),
+            'precision': precision
+        }
+        return [summary] if streaming else results
+
     def run_simulation(self,
                        site_params: Dict,
                        market_params: Dict,
                        growth_params: Dict,
-                       cost_params: Dict) -> pd.DataFrame:
-        print(f"Running {self.n_simulations} Monte Carlo simulations...")
-        scenarios = []
+                       cost_params: Dict,
+                       vectorized: bool = False,
+                       batch_size: int = 50000,
+                       n_workers: Optional[int] = 1,
+                       keep_paths: bool = True,
+                       streaming: bool = False,
+                       tolerances: Optional[Dict[str, float]] = None,
+                       confidence: float = 0.95,
+                       path_dir: Optional[str] = None,
+                       cache: Optional[ResultCache] = None,
+                       checkpoint_dir: Optional[str] = None,
+                       fan_charts: bool = False,
+                       path_columns: Optional[bool] = None) -> pd.DataFrame:
+        """Simulate n_simulations scenarios and compute summary_stats.
+
+        Kept paths are stored in self.scenarios.paths as 2-D arrays. By
+        default the scalar engine also returns them as DataFrame object
+        columns, as it always has, while batched, streaming and path_dir
+        runs return the scalar columns only. path_columns=True/False
+        overrides this; the object columns cost one array view per scenario
+        and path type.
+
+        With a ResultCache, an identical earlier run (same config, seed,
+        parameters and result-affecting options) is loaded instead of
+        re-simulated. Unseeded, streaming and path_dir runs bypass the cache.
+
+        With checkpoint_dir, every finished shard is saved there. Calling
+        again with the same directory and settings resumes an interrupted
+        run, or extends a finished one when n_simulations has grown; only
+        the missing shards are simulated.
+
+        With fan_charts, per-timestep quantile bands (FAN_CHART_LEVELS) and
+        means of the price, weight and cost paths are accumulated shard by
+        shard into self.fan_charts, whether or not paths are kept."""
+        self.site_params = site_params
+        if path_columns and (not keep_paths or path_dir is not None):
+            raise ValueError("path_columns needs keep_paths=True and no path_dir")
+        if fan_charts:
+            vectorized = True
+        if checkpoint_dir is not None:
+            if tolerances is not None or path_dir is not None:
+                raise ValueError("checkpoint_dir cannot be combined with tolerances or path_dir")
+            vectorized = True
+        if self.sampling != 'pseudo':
+            vectorized = True
+            batch_size = self._shard_size(batch_size)
+        batched = vectorized or n_workers != 1 or tolerances is not None
+        if path_columns is None:
+            path_columns = keep_paths and not batched and path_dir is None and not streaming
+        cache_key = None
+        if cache is not None and self.random_seed is not None and not streaming and path_dir is None:
+            cache_key = ResultCache.key(
+                {'n_simulations': self.n_simulations,
+                 'time_horizon_days': self.time_horizon_days,
+                 'time_steps': self.time_steps,
+                 'random_seed': self.random_seed,
+                 'sampling': self.sampling,
+                 'control_variate': self.control_variate,
+                 'path_dtype': self.path_dtype.name},
+                # shard sizes only change the random streams of the batched engines
+                {'vectorized': batched,
+                 'batch_size': batch_size if batched else None,
+                 'keep_paths': keep_paths,
+                 'fan_charts': fan_charts,
+                 'tolerances': tolerances,
+                 'confidence': confidence if tolerances is not None else None},
+                site_params, market_params, growth_params, cost_params
+            )
+            cached = cache.get(cache_key)
+            if cached is not None:
+                self._load_results(cached)
+                print(f"✓ Loaded {len(self.scenarios)} cached scenarios")
+                return self.scenarios.to_dataframe(include_paths=path_columns)
+
+        df = self._run_simulation(site_params, market_params, growth_params, cost_params,
+                                  vectorized, batch_size, n_workers, keep_paths, streaming,
+                                  tolerances, confidence, path_dir, checkpoint_dir, fan_charts,
+                                  path_columns)
+        if cache_key is not None:
+            cache.put(cache_key, self._npz_arrays(keep_paths, path_dtype=self.path_dtype))
+        return df
+
+    def _load_results(self, results: Dict):
+        """Restore scenarios and statistics from read_results_npz output"""
+        metadata = results['metadata']
+        self.adaptive_run = metadata.get('adaptive_run')
+        self.streaming_summary = None
+        self.scenarios = ScenarioStore(results['scenarios'], results['paths'])
+        self.summary_stats = results['summary_statistics']
+        self.scenario_index = results.get('scenario_index') or ScenarioIndex.build(self.scenarios.columns)
+        fan = results.get('fan_charts')
+        self.fan_charts = None if fan is None else {
+            kind: {stat: band.tolist() for stat, band in chart.items()} if isinstance(chart, dict) else chart.tolist()
+            for kind, chart in fan.items()
+        }
+
+    def _run_simulation(self,
+                        site_params: Dict,
+                        market_params: Dict,
+                        growth_params: Dict,
+                        cost_params: Dict,
+                        vectorized: bool,
+                        batch_size: int,
+                        n_workers: Optional[int],
+                        keep_paths: bool,
+                        streaming: bool,
+                        tolerances: Optional[Dict[str, float]],
+                        confidence: float,
+                        path_dir: Optional[str],
+                        checkpoint_dir: Optional[str] = None,
+                        fan_charts: bool = False,
+                        path_columns: bool = False) -> pd.DataFrame:
+        if tolerances is not None:
+            print(f"Running Monte Carlo simulations to target precision (budget {self.n_simulations})...")
+        else:
+            print(f"Running {self.n_simulations} Monte Carlo simulations...")
+        self.streaming_summary = None
+        self.adaptive_run = None
+        self.control_mean = self.expected_terminal_price(market_params) if self.control_variate else None
+
+        self.fan_charts = None
+        options = {'streaming': streaming, 'path_dir': path_dir,
+                   'checkpoint_dir': checkpoint_dir, 'keep_paths': keep_paths,
+                   'fan_charts': fan_charts, 'replicate_size': self._replicate_size(batch_size)}
+        if path_dir is not None:
+            # out-of-core paths: every shard writes its rows straight into
+            # preallocated memory-mapped files, sized for the full budget
+            vectorized = True
+            PathArchive.create(path_dir, self.n_simulations, self.time_steps, self.path_dtype)
+
+        if tolerances is not None:
+            # precision-driven: n_simulations is only the budget cap
+            results = self._run_until_precision(site_params, market_params, growth_params,
+                                                cost_params, tolerances, confidence,
+                                                batch_size, n_workers, options)
+        elif checkpoint_dir is not None:
+            checkpoint = RunCheckpoint(
+                checkpoint_dir,
+                {'time_horizon_days': self.time_horizon_days,
+                 'time_steps': self.time_steps,
+                 'sampling': self.sampling,
+                 'control_variate': self.control_variate,
+                 'path_dtype': self.path_dtype.name,
+                 'batch_size': batch_size,
+                 'streaming': streaming,
+                 'keep_paths': keep_paths,
+                 'fan_charts': fan_charts,
+                 'params': [site_params, market_params, growth_params, cost_params]},
+                self.seed_sequence.entropy, fixed_seed=self.random_seed is not None
+            )
+            # an unseeded run resumes with the entropy it started from
+            self.seed_sequence = np.random.SeedSequence(checkpoint.entropy)
+            results = self._iter_checkpointed_shards(site_params, market_params, growth_params,
+                                                     cost_params, checkpoint, batch_size,
+                                                     n_workers, options)
+        elif streaming or vectorized or n_workers != 1:
+            results = self._iter_shards(site_params, market_params, growth_params, cost_params,
+                                        self._shard_plan(batch_size, self.n_simulations),
+                                        n_workers, options)
+        else:
+            results = None
+
+        if path_dir is not None:
+            results = list(results)
+            PathArchive.finalize(path_dir, self.n_completed, self._metadata())
+
+        if streaming:
+            # constant memory: shards are reduced to mergeable accumulators
+            # and no scenario is kept, so the returned DataFrame is empty
+            summary = StreamingSummary()
+            for shard_summary in results:
+                summary.merge(shard_summary)
+            self.streaming_summary = summary
+            self.scenarios = ScenarioStore()
+            self.scenario_index = None
+            self.summary_stats = summary.summary_stats()
+            if summary.fan_chart is not None:
+                self.fan_charts = summary.fan_chart.bands(self.time_horizon_days)
+            print(f"✓ Simulation complete!")
+            return self.scenarios.to_dataframe()
+
+        if results is not None:
+            results = list(results)
+            if fan_charts:
+                fan = FanChart()
+                for batch in results:
+                    fan.merge(batch.pop('fan_chart'))
+                self.fan_charts = fan.bands(self.time_horizon_days)
+            self.scenarios = ScenarioStore.from_batches(results, site_params,
+                                                        keep_paths and path_dir is None)
+            if path_dir is not None and keep_paths:
+                archive = PathArchive(path_dir)
+                self.scenarios.paths = {key: archive.paths(key) for key in ScenarioStore.PATH_COLUMNS}
+            self._calculate_summary_statistics(self.scenarios, self._replicate_size(batch_size))
+            print(f"✓ Simulation complete!")
+            return self.scenarios.to_dataframe(include_paths=path_columns)
+
+        n = self.n_simulations
+        results = {key: np.empty(n) for key in ScenarioStore.SCALAR_COLUMNS[3:]}
+        results.update({key: np.empty((n, self.time_steps + 1), dtype=self.path_dtype)
+                        for key in ScenarioStore.PATH_COLUMNS})
+        for key in ('n_mortality_events', 'surviving_fish'):
+            results[key] = np.empty(n, dtype=np.int64)
+
         for sim_id in range(self.n_simulations):
             if (sim_id + 1) % 1000 == 0:
                 print(f"  Completed {sim_id + 1}/{self.n_simulations} simulations")
@@ -143,141 +2010,653 @@ class MonteCarlo_Simulation:
                 survival_rate
             )
 
-            scenario = {
-                'simulation_id': sim_id,
-                'site_id': site_params['site_id'],
-                'species': site_params['species'],
-                'survival_rate': survival_rate,
-                'n_mortality_events': len(jump_times),
-                'final_price': metrics['final_price'],
-                'final_weight_kg': metrics['final_weight_kg'],
-                'total_biomass_kg': metrics['total_biomass_kg'],
-                'surviving_fish': metrics['surviving_fish'],
-                'revenue': metrics['revenue'],
-                'total_cost': metrics['total_cost'],
-                'profit': metrics['profit'],
-                'roi': metrics['roi'],
-                'profit_margin': metrics['profit_margin'],
-                'price_path': price_path.tolist(),
-                'weight_path': weight_path.tolist(),
-                'cost_path': cost_path.tolist()
-            }
-            scenarios.append(scenario)
-        self.scenarios = scenarios
-        df = pd.DataFrame(scenarios)
-        self._calculate_summary_statistics(df)
+            for key, value in metrics.items():
+                results[key][sim_id] = value
+            results['survival_rate'][sim_id] = survival_rate
+            results['n_mortality_events'][sim_id] = len(jump_times)
+            results['price_path'][sim_id] = price_path
+            results['weight_path'][sim_id] = weight_path
+            results['cost_path'][sim_id] = cost_path
+
+        self.scenarios = ScenarioStore.from_batches([results], site_params, keep_paths)
+        self._calculate_summary_statistics(self.scenarios)
         print(f"✓ Simulation complete!")
-        return df 
+        return self.scenarios.to_dataframe(include_paths=path_columns)
     
-    def _calculate_summary_statistics(self, df: pd.DataFrame):
-        profits = df['profit'].values
-        returns = df['roi'].values
+    def _simulate_portfolio_batch(self,
+                                  n_paths: int,
+                                  sites: List[Dict],
+                                  params: Tuple[Dict, Dict, Dict],
+                                  price_factor: np.ndarray,
+                                  zone_codes: np.ndarray,
+                                  zone_jump_correlation: float,
+                                  rng: np.random.Generator) -> np.ndarray:
+        """Profit per (scenario, site) for one batch of the portfolio model;
+        price_factor maps independent price shocks (columns) onto sites"""
+        market, growth, cost = params
+        n_sites = len(sites)
+        shape = (n_paths, n_sites, self.time_steps)
+        sqrt_dt = float(np.sqrt(self.dt))
+
+        # price shocks: correlated across sites at every step via the Cholesky factor
+        z = self._normal(rng, (n_paths, self.time_steps, price_factor.shape[1])) @ price_factor.T.astype(self.path_dtype)
+        price_paths = gbm_paths(market['initial_price'], market['drift'], market['volatility'],
+                                np.swapaxes(z, 1, 2) * sqrt_dt, self.dt)
+
+        # mortality jumps: a zone-wide uniform fires the shared part of the
+        # intensity, an independent one the rest, keeping P(jump) = 1 - exp(-lambda*dt)
+        intensity = growth['jump_intensity'][:, None] * self.dt
+        zone_draws = rng.random((n_paths, zone_codes.max() + 1, self.time_steps))[:, zone_codes, :]
+        jumps = ((zone_draws < -np.expm1(-zone_jump_correlation * intensity))
+                 | (rng.random(shape) < -np.expm1(-(1 - zone_jump_correlation) * intensity)))
+        weight_paths = jump_diffusion_paths(
+            [site['initial_weight'] for site in sites],
+            growth['growth_rate'], growth['growth_vol'], growth['jump_mean'], growth['jump_std'],
+            self._normal(rng, shape, sqrt_dt), jumps, self._normal(rng, shape), self.dt
+        )
+        n_jumps = jumps.sum(axis=-1)
+
+        cost_paths = ou_paths(cost['initial_cost'], cost['theta'], cost['mean_cost'], cost['sigma'],
+                              self._normal(rng, shape, sqrt_dt), self.dt)
+
+        survival_rates = np.maximum(growth['base_survival'] - n_jumps * 0.05, 0.5)
+        n_fish = np.array([site['n_fish'] for site in sites])
+        return self.calculate_financial_metrics_batch(
+            price_paths, weight_paths, cost_paths, n_fish, survival_rates)['profit']
+
+    def run_portfolio(self,
+                      sites: List[Dict],
+                      market_params: Dict,
+                      growth_params: Dict,
+                      cost_params: Dict,
+                      price_correlation: Optional[np.ndarray] = None,
+                      zone_jump_correlation: float = 0.5,
+                      batch_size: Optional[int] = None) -> Dict:
+        """Simulate several sites jointly and report portfolio risk.
+
+        Each site dict needs site_id, regulatory_zone, n_fish and
+        initial_weight, and may override any of the shared parameter dicts
+        under 'market_params', 'growth_params' or 'cost_params'. Price shocks
+        are correlated across sites by ``price_correlation`` (identity by
+        default); mortality events are correlated within a regulatory zone,
+        ``zone_jump_correlation`` being the share of each site's jump
+        intensity driven by a zone-wide shock."""
+        n_sites = len(sites)
+        if n_sites == 0:
+            raise ValueError("run_portfolio needs at least one site")
+        if not 0 <= zone_jump_correlation <= 1:
+            raise ValueError("zone_jump_correlation must be in [0, 1]")
+        if price_correlation is None:
+            price_correlation = np.eye(n_sites)
+        price_correlation = np.asarray(price_correlation, dtype=np.float64)
+        if price_correlation.shape != (n_sites, n_sites):
+            raise ValueError(f"price_correlation must be {n_sites}x{n_sites}")
+        try:
+            price_factor = np.linalg.cholesky(price_correlation)
+        except np.linalg.LinAlgError:
+            raise ValueError("price_correlation must be symmetric positive definite")
+
+        params = _unit_params(sites, market_params, growth_params, cost_params)
+        _, zone_codes = np.unique([str(site['regulatory_zone']) for site in sites], return_inverse=True)
+
+        # keep each batch's (paths, sites, steps) arrays around 50 MB
+        batch_size = batch_size or max(1, 100_000 // n_sites)
+        print(f"Running {self.n_simulations} portfolio simulations over {n_sites} sites...")
+        profits = np.empty((self.n_simulations, n_sites))
+        for idx, start, n_paths in self._shard_plan(batch_size, self.n_simulations):
+            profits[start:start + n_paths] = self._simulate_portfolio_batch(
+                n_paths, sites, params, price_factor, zone_codes.ravel(),
+                zone_jump_correlation, self.shard_generator(idx))
+
+        self.portfolio_results = portfolio_risk_contributions(profits, [site['site_id'] for site in sites])
+        self.portfolio_results['price_correlation'] = price_correlation.tolist()
+        self.portfolio_results['zone_jump_correlation'] = zone_jump_correlation
+        print("✓ Portfolio simulation complete!")
+        return self.portfolio_results
+
+    COHORT_GROUPS = ('site_id', 'species', 'regulatory_zone')
+
+    def run_cohorts(self,
+                    cohorts: List[Dict],
+                    market_params: Dict,
+                    growth_params: Dict,
+                    cost_params: Dict,
+                    species_price_correlation: Optional[np.ndarray] = None,
+                    zone_jump_correlation: float = 0.5,
+                    batch_size: Optional[int] = None) -> Dict:
+        """Simulate every cohort of the farm in one run and aggregate the
+        profit by site, species and regulatory zone.
+
+        Cohorts (see cohorts_from_dataset) are portfolio units that also carry
+        a species and may override the shared parameter dicts the same way.
+        Cohorts of one species sell at one price path; the species' price
+        shocks are correlated by ``species_price_correlation`` (identity by
+        default, species in sorted order). Mortality events are correlated
+        within a regulatory zone as in run_portfolio. Each grouping reports
+        the standalone risk of its groups and their contributions to the
+        farm's VaR/CVaR."""
+        n_cohorts = len(cohorts)
+        if n_cohorts == 0:
+            raise ValueError("run_cohorts needs at least one cohort")
+        if not 0 <= zone_jump_correlation <= 1:
+            raise ValueError("zone_jump_correlation must be in [0, 1]")
+        species, species_codes = np.unique([str(c['species']) for c in cohorts], return_inverse=True)
+        if species_price_correlation is None:
+            species_price_correlation = np.eye(len(species))
+        species_price_correlation = np.asarray(species_price_correlation, dtype=np.float64)
+        if species_price_correlation.shape != (len(species), len(species)):
+            raise ValueError(f"species_price_correlation must be {len(species)}x{len(species)}")
+        try:
+            # row s of the Cholesky factor drives every cohort of species s
+            price_factor = np.linalg.cholesky(species_price_correlation)[species_codes.ravel()]
+        except np.linalg.LinAlgError:
+            raise ValueError("species_price_correlation must be symmetric positive definite")
+
+        params = _unit_params(cohorts, market_params, growth_params, cost_params)
+        _, zone_codes = np.unique([str(c['regulatory_zone']) for c in cohorts], return_inverse=True)
+        # (n_cohorts, n_groups) membership matrices fold cohort profits into groups
+        groupings = {}
+        for column in self.COHORT_GROUPS:
+            labels, codes = np.unique([c[column] for c in cohorts], return_inverse=True)
+            groupings[column] = (labels.tolist(), np.eye(len(labels))[codes.ravel()])
+
+        batch_size = batch_size or max(1, 100_000 // n_cohorts)
+        print(f"Running {self.n_simulations} farm simulations over {n_cohorts} cohorts...")
+        group_profits = {column: np.empty((self.n_simulations, len(labels)))
+                         for column, (labels, _) in groupings.items()}
+        # per-cohort mean and M2, merged batch by batch as in RunningMoments
+        cohort_mean, cohort_m2 = np.zeros(n_cohorts), np.zeros(n_cohorts)
+        for idx, start, n_paths in self._shard_plan(batch_size, self.n_simulations):
+            profits = self._simulate_portfolio_batch(
+                n_paths, cohorts, params, price_factor, zone_codes.ravel(),
+                zone_jump_correlation, self.shard_generator(idx))
+            batch_mean = profits.mean(axis=0)
+            delta = batch_mean - cohort_mean
+            cohort_mean += delta * n_paths / (start + n_paths)
+            cohort_m2 += ((profits - batch_mean) ** 2).sum(axis=0) + delta ** 2 * start * n_paths / (start + n_paths)
+            for column, (_, membership) in groupings.items():
+                group_profits[column][start:start + n_paths] = profits @ membership
+
+        n = self.n_simulations
+        cohort_std = np.sqrt(cohort_m2 / n)
+        self.cohort_results = {
+            'n_simulations': n,
+            'n_cohorts': n_cohorts,
+            'farm': _tail_stats(group_profits['site_id'].sum(axis=1)),
+            'cohorts': [{'cohort_id': c.get('cohort_id'), 'site_id': c['site_id'], 'species': c['species'],
+                         'regulatory_zone': c['regulatory_zone'],
+                         'mean_profit': float(mean), 'std_profit': float(std)}
+                        for c, mean, std in zip(cohorts, cohort_mean, cohort_std)],
+            'species_price_correlation': species_price_correlation.tolist(),
+            'zone_jump_correlation': zone_jump_correlation
+        }
+        for column, (labels, _) in groupings.items():
+            contributions = portfolio_risk_contributions(group_profits[column], labels, label=column)
+            self.cohort_results[f'by_{column}'] = {
+                'groups': contributions['sites'],
+                'diversification_benefit': contributions['diversification_benefit']
+            }
+        print("✓ Farm simulation complete!")
+        return self.cohort_results
+
+    def _simulate_sweep_batch(self,
+                              n_paths: int,
+                              params: Tuple[Dict, Dict, Dict, Dict],
+                              rng: np.random.Generator) -> Dict[str, np.ndarray]:
+        """Metrics of shape (n_paths, n_sets): every parameter set is driven
+        by the same shocks, drawn once with a singleton set axis"""
+        site, market, growth, cost = params
+        shape = (n_paths, 1, self.time_steps)
+        dW_price, dW_cost = self.brownian_increments(n_paths, rng)
+        price_paths = gbm_paths(market['initial_price'], market['drift'], market['volatility'],
+                                dW_price[:, None], self.dt)
+
+        # shared uniforms couple the jump times monotonically: raising the
+        # intensity only ever adds jumps to a scenario
+        jumps = rng.random(shape) < -np.expm1(-_per_path(growth['jump_intensity']) * self.dt)
+        weight_paths = jump_diffusion_paths(
+            site['initial_weight'], growth['growth_rate'], growth['growth_vol'],
+            growth['jump_mean'], growth['jump_std'],
+            self._normal(rng, shape, np.sqrt(self.dt)), jumps, self._normal(rng, shape), self.dt
+        )
+        n_jumps = jumps.sum(axis=-1)
+
+        cost_paths = ou_paths(cost['initial_cost'], cost['theta'], cost['mean_cost'], cost['sigma'],
+                              dW_cost[:, None], self.dt)
+
+        survival_rates = np.maximum(growth['base_survival'] - n_jumps * 0.05, 0.5)
+        metrics = self.calculate_financial_metrics_batch(
+            price_paths, weight_paths, cost_paths, site['n_fish'], survival_rates)
+        metrics['n_mortality_events'] = n_jumps
+        return metrics
+
+    def run_sweep(self,
+                  site_params: Dict,
+                  market_params: Dict,
+                  growth_params: Dict,
+                  cost_params: Dict,
+                  parameter_sets: Union[Dict[str, List], List[Dict]],
+                  batch_size: Optional[int] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Evaluate many parameter sets on common random numbers.
+
+        ``parameter_sets`` is either a list of overrides such as
+        [{'drift': 0.03}, {'drift': 0.07, 'theta': 0.2}] or a grid
+        {'drift': [...], 'volatility': [...]} expanded by parameter_grid.
+        Names refer to keys of the four parameter dicts. All sets see the
+        same shocks in one batched pass, so differences between sets carry
+        far less noise than independent reruns.
+
+        Returns (summary, sensitivities): one row per set with its swept
+        values and risk metrics, and finite-difference derivatives of those
+        metrics along each swept parameter."""
+        if isinstance(parameter_sets, dict):
+            parameter_sets = parameter_grid(**parameter_sets)
+        if not parameter_sets:
+            raise ValueError("run_sweep needs at least one parameter set")
+        # per-set numeric parameter arrays, shape (n_sets,)
+        params = tuple(
+            {name: np.array([overrides.get(name, value) for overrides in parameter_sets], dtype=np.float64)
+             for name, value in group.items() if not isinstance(value, str)}
+            for group in (site_params, market_params, growth_params, cost_params)
+        )
+        values = {name: array for group in params for name, array in group.items()}
+        swept = list(dict.fromkeys(name for overrides in parameter_sets for name in overrides))
+        unknown = [name for name in swept if name not in values]
+        if unknown:
+            raise ValueError(f"Unknown sweep parameters: {unknown}")
+        n_sets = len(parameter_sets)
+        # keep each batch's (paths, sets, steps) arrays around 50 MB
+        batch_size = self._shard_size(batch_size or max(1, 100_000 // n_sets))
+        print(f"Running {self.n_simulations} Monte Carlo simulations for {n_sets} parameter sets...")
+        columns = ('profit', 'roi', 'final_price', 'n_mortality_events')
+        results = {key: np.empty((self.n_simulations, n_sets)) for key in columns}
+        for idx, start, n_paths in self._shard_plan(batch_size, self.n_simulations):
+            batch = self._simulate_sweep_batch(n_paths, params, self.shard_generator(idx))
+            for key in columns:
+                results[key][start:start + n_paths] = batch[key]
+
+        control_means = self.expected_terminal_price(params[1]) if self.control_variate else None
+        rows = []
+        for j in range(n_sets):
+            profits = results['profit'][:, j]
+            control = None if control_means is None else results['final_price'][:, j] - control_means[j]
+            estimates, standard_errors, _ = risk_metric_estimates(
+                profits, paired=self.sampling == 'antithetic', control=control,
+                replicate_size=self._replicate_size(batch_size))
+            row = {'set_id': j}
+            row.update({name: float(values[name][j]) for name in swept})
+            row.update(estimates)
+            row.update({
+                'std_profit': float(np.std(profits)),
+                'median_profit': float(np.median(profits)),
+                'mean_roi': float(np.mean(results['roi'][:, j])),
+                'mean_mortality_events': float(np.mean(results['n_mortality_events'][:, j])),
+            })
+            row.update({f'se_{metric}': se for metric, se in standard_errors.items()})
+            rows.append(row)
+
+        summary = pd.DataFrame(rows)
+        metrics = [c for c in summary.columns if c not in swept and c != 'set_id' and not c.startswith('se_')]
+        sensitivities = finite_difference_sensitivities(summary, swept, metrics)
+        self.sweep_results = {'summary': summary, 'sensitivities': sensitivities}
+        print("✓ Sweep complete!")
+        return summary, sensitivities
+
+    STRESS_KEYS = ('name', 'price_shocks', 'mortality_events', 'cost_shifts')
+
+    def _stress_timestep(self, day: float) -> int:
+        """First path index at or after day"""
+        if not 0 <= day <= self.time_horizon_days:
+            raise ValueError(f"Stress day {day} is outside the 0-{self.time_horizon_days} day horizon")
+        return min(int(np.ceil(day / self.dt - 1e-9)), self.time_steps)
+
+    def stress_test(self,
+                    stresses: Union[Dict[str, Dict], List[Dict]],
+                    chunk_size: int = 100_000) -> pd.DataFrame:
+        """Re-price the simulated scenarios under deterministic shocks.
+
+        Each stress is a dict (keyed by name, or carrying 'name') with any of
+          'price_shocks':     [{'day': 90, 'factor': 0.7}]  price x factor from day on
+          'mortality_events': [{'day': 60, 'size': -0.1}]   weight x (1 + size) from
+                              day on, and survival down 0.05 per event (floor 0.5)
+          'cost_shifts':      [{'day': 0, 'amount': 50.0}]  cost + amount per step
+                              from day on, floored at zero like the OU path
+        Shocks persist to the end of the horizon, so price and weight shocks
+        only rescale the final values, and positive cost shifts add a fixed
+        amount; only negative cost shifts need the stored cost paths, which
+        are read chunk_size rows at a time. Returns one row per stress (after
+        an unstressed 'baseline' row) with risk metrics and their change."""
+        if len(self.scenarios) == 0:
+            raise ValueError("stress_test needs scenario results; streaming runs keep none")
+        if self.site_params is None:
+            raise ValueError("stress_test needs the site_params of the run (run_simulation first)")
+        if isinstance(stresses, dict):
+            stresses = [{'name': name, **spec} for name, spec in stresses.items()]
+
+        scenarios = self.scenarios
+        n_fish = self.site_params['n_fish']
+        rows = [self._stress_row('baseline', scenarios['profit'], scenarios['roi'])]
+        for i, stress in enumerate(stresses):
+            unknown = set(stress) - set(self.STRESS_KEYS)
+            if unknown:
+                raise ValueError(f"Unknown stress keys {sorted(unknown)}; expected {self.STRESS_KEYS}")
+
+            price_factor = 1.0
+            for shock in stress.get('price_shocks', []):
+                self._stress_timestep(shock['day'])
+                price_factor *= shock['factor']
+            weight_factor, n_events = 1.0, 0
+            for event in stress.get('mortality_events', []):
+                self._stress_timestep(event['day'])
+                weight_factor *= max(1 + event['size'], 0)
+                n_events += 1
+
+            # per-step shift of the cost path, shape (time_steps + 1,)
+            shift = np.zeros(self.time_steps + 1)
+            for cost_shift in stress.get('cost_shifts', []):
+                shift[self._stress_timestep(cost_shift['day']):] += cost_shift['amount']
+            if np.all(shift >= 0):
+                total_cost = scenarios['total_cost'] + shift.sum()
+            elif not scenarios.has_paths:
+                raise ValueError("Negative cost shifts need stored cost paths (keep_paths=True or path_dir)")
+            else:
+                cost_paths = scenarios.paths['cost_path']
+                total_cost = np.empty(len(scenarios))
+                for start in range(0, len(scenarios), chunk_size):
+                    chunk = np.asarray(cost_paths[start:start + chunk_size], dtype=np.float64)
+                    total_cost[start:start + chunk_size] = np.maximum(chunk + shift, 0).sum(axis=1)
+
+            survival_rates = np.maximum(scenarios['survival_rate'] - 0.05 * n_events, 0.5)
+            metrics = self.calculate_financial_metrics_batch(
+                (scenarios['final_price'] * price_factor)[:, None],
+                (scenarios['final_weight_kg'] * 1000 * weight_factor)[:, None],
+                total_cost[:, None],
+                n_fish,
+                survival_rates
+            )
+            rows.append(self._stress_row(stress.get('name', f'stress_{i + 1}'),
+                                         metrics['profit'], metrics['roi']))
+
+        table = pd.DataFrame(rows)
+        for metric in ('mean_profit', 'var_95', 'cvar_95', 'prob_loss'):
+            table[f'delta_{metric}'] = table[metric] - table[metric].iloc[0]
+        self.stress_results = table
+        return table
+
+    def _harvest_profits(self, start: int, stop: int, first_step: int) -> np.ndarray:
+        """Profit of harvesting at every timestep >= first_step for scenarios
+        [start, stop): shape (stop - start, time_steps + 1 - first_step)"""
+        paths = self.scenarios.paths
+        price = np.asarray(paths['price_path'][start:stop], dtype=np.float64)
+        weight_kg = np.asarray(paths['weight_path'][start:stop], dtype=np.float64) / 1000
+        cumulative_cost = np.cumsum(np.asarray(paths['cost_path'][start:stop], dtype=np.float64), axis=1)
+        surviving_fish = np.floor(self.site_params['n_fish'] * self.scenarios['survival_rate'][start:stop])
+        profits = surviving_fish[:, None] * weight_kg * price - cumulative_cost
+        return profits[:, first_step:]
+
+    def optimize_harvest(self,
+                         min_day: float = 0.0,
+                         chunk_size: int = 100_000) -> Dict:
+        """Best harvest timing over the simulated paths.
+
+        Harvesting at step t earns surviving_fish * weight[t] * price[t] and
+        pays the cost accumulated up to t, evaluated for every candidate step
+        from min_day to the horizon in one vectorized pass per chunk. Two
+        policies are compared with harvesting at the horizon:
+          - fixed: the single harvest day with the highest expected profit
+          - per_scenario: each scenario's best day with hindsight, an upper
+            bound on what any timing rule could gain
+        Survival uses each scenario's mortality over the whole horizon (the
+        stored results do not record when events happened), so early
+        harvests are not credited with mortality they would have avoided."""
+        if not self.scenarios.has_paths:
+            raise ValueError("optimize_harvest needs stored paths (keep_paths=True or path_dir)")
+        if self.site_params is None:
+            raise ValueError("optimize_harvest needs the site_params of the run (run_simulation first)")
+        first_step = self._stress_timestep(min_day)
+        days = np.arange(first_step, self.time_steps + 1) * self.dt
+        n = len(self.scenarios)
+        chunks = [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+
+        expected = np.zeros(len(days))
+        best_profit = np.empty(n)
+        best_step = np.empty(n, dtype=np.int64)
+        for start, stop in chunks:
+            profits = self._harvest_profits(start, stop, first_step)
+            expected += profits.sum(axis=0)
+            best_step[start:stop] = np.argmax(profits, axis=1)
+            best_profit[start:stop] = profits[np.arange(stop - start), best_step[start:stop]]
+        expected /= n
+
+        fixed_step = int(np.argmax(expected))
+        fixed_profit = np.concatenate([self._harvest_profits(start, stop, first_step)[:, fixed_step]
+                                       for start, stop in chunks])
+        horizon = _tail_stats(self.scenarios['profit'])
+
+        def policy(profits: np.ndarray) -> Dict:
+            stats = _tail_stats(profits)
+            stats['expected_gain'] = stats['mean'] - horizon['mean']
+            stats['change'] = {metric: stats[metric] - horizon[metric]
+                               for metric in ('var_95', 'var_99', 'cvar_95', 'cvar_99', 'prob_loss')}
+            return stats
+
+        self.harvest_results = {
+            'days': days.tolist(),
+            'expected_profit_by_day': expected.tolist(),
+            'horizon': horizon,
+            'fixed': {'harvest_day': float(days[fixed_step]), **policy(fixed_profit)},
+            'per_scenario': {
+                'mean_harvest_day': float(np.mean(days[best_step])),
+                'harvest_day_counts': np.bincount(best_step, minlength=len(days)).tolist(),
+                'share_harvested_early': float(np.mean(best_step < len(days) - 1)),
+                **policy(best_profit)
+            }
+        }
+        return self.harvest_results
+
+    def _stress_row(self, name: str, profits: np.ndarray, returns: np.ndarray) -> Dict:
+        stats = _tail_stats(profits)
+        row = {'stress': name,
+               'mean_profit': stats.pop('mean'),
+               'median_profit': float(np.median(profits)),
+               'std_profit': stats.pop('std'),
+               'mean_roi': float(np.mean(returns))}
+        row.update(stats)
+        return row
+
+    def _calculate_summary_statistics(self, scenarios: ScenarioStore, replicate_size: Optional[int] = None):
+        profits = scenarios['profit']
+        returns = scenarios['roi']
         
+        # the index's profit ordering is the only profit sort: it serves
+        # every order statistic and tail estimate below
+        self.scenario_index = ScenarioIndex.build(scenarios.columns)
+        sorted_profits = self.scenario_index.sorted_profit
+        profit = risk_metrics(sorted_profits, percentiles=(10, 25, 50, 75, 90), presorted=True)
+        roi = risk_metrics(returns, percentiles=(50,), confidence_levels=(), thresholds=(0.3,))
+        n = profit['n']
+
         # Basic statistics
         self.summary_stats = {
-            'n_simulations': self.n_simulations,
-            'mean_profit': float(np.mean(profits)),
-            'median_profit': float(np.median(profits)),
-            'std_profit': float(np.std(profits)),
-            'min_profit': float(np.min(profits)),
-            'max_profit': float(np.max(profits)),
+            'n_simulations': self.n_completed,
+            'mean_profit': profit['mean'],
+            'median_profit': profit['p50'],
+            'std_profit': profit['std'],
+            'min_profit': profit['min'],
+            'max_profit': profit['max'],
             
-            'mean_roi': float(np.mean(returns)),
-            'median_roi': float(np.median(returns)),
-            'std_roi': float(np.std(returns)),
+            'mean_roi': roi['mean'],
+            'median_roi': roi['p50'],
+            'std_roi': roi['std'],
             
             # Risk metrics
-            'var_95': float(np.percentile(profits, 5)),  # 95% VaR
-            'var_99': float(np.percentile(profits, 1)),  # 99% VaR
-            'cvar_95': float(np.mean(profits[profits <= np.percentile(profits, 5)])),
-            'cvar_99': float(np.mean(profits[profits <= np.percentile(profits, 1)])),
+            'var_95': profit['var_95'],  # 95% VaR
+            'var_99': profit['var_99'],  # 99% VaR
+            'cvar_95': profit['cvar_95'],
+            'cvar_99': profit['cvar_99'],
             
             # Probability metrics
-            'prob_loss': float(np.mean(profits < 0)),
-            'prob_profit': float(np.mean(profits > 0)),
-            'prob_high_return': float(np.mean(returns > 0.3)),  # ROI > 30%
+            'prob_loss': profit['tail_counts'][0.0]['below'] / n,
+            'prob_profit': profit['tail_counts'][0.0]['above'] / n,
+            'prob_high_return': roi['tail_counts'][0.3]['above'] / n,  # ROI > 30%
             
             # Sharpe ratio (assuming risk-free rate = 0 for simplicity)
-            'sharpe_ratio': float(np.mean(returns) / np.std(returns)) if np.std(returns) > 0 else 0,
+            'sharpe_ratio': roi['mean'] / roi['std'] if roi['std'] > 0 else 0,
             
             # Percentiles
-            'profit_p10': float(np.percentile(profits, 10)),
-            'profit_p25': float(np.percentile(profits, 25)),
-            'profit_p75': float(np.percentile(profits, 75)),
-            'profit_p90': float(np.percentile(profits, 90)),
+            'profit_p10': profit['p10'],
+            'profit_p25': profit['p25'],
+            'profit_p75': profit['p75'],
+            'profit_p90': profit['p90'],
+        }
+
+        control = None
+        if self.control_mean is not None:
+            control = scenarios['final_price'] - self.control_mean
+        estimates, standard_errors, ess = risk_metric_estimates(
+            profits, paired=self.sampling == 'antithetic', control=control, ordered=sorted_profits,
+            replicate_size=replicate_size)
+        self.summary_stats.update(estimates)
+        self.summary_stats['standard_errors'] = standard_errors
+        self.summary_stats['effective_sample_size'] = ess
+
+    def _metadata(self) -> Dict:
+        metadata = {
+            'simulation_type': 'monte_carlo_aquaculture',
+            'generated_at': datetime.now().isoformat(),
+            'n_simulations': self.n_completed,
+            'time_horizon_days': self.time_horizon_days,
+            'time_steps': self.time_steps,
+            'path_dtype': self.path_dtype.name
         }
+        if self.adaptive_run is not None:
+            # batches used and confidence-interval half-widths reached
+            metadata['adaptive_run'] = self.adaptive_run
+        return metadata
 
     def write_to_json(self, 
                      filepath: str,
                      include_paths: bool = False):
-        # Prepare scenarios for export
-        scenarios_export = []
-        
-        for scenario in self.scenarios:
-            scenario_export = scenario.copy()
-            
-            # Remove paths if not requested (reduces file size significantly)
-            if not include_paths:
-                scenario_export.pop('price_path', None)
-                scenario_export.pop('weight_path', None)
-                scenario_export.pop('cost_path', None)
-            
-            scenarios_export.append(scenario_export)
+        # Paths are left out unless requested (reduces file size significantly)
+        scenarios_export = self.scenarios.records(include_paths=include_paths)
         
         # Create output structure
         output = {
-            'metadata': {
-                'simulation_type': 'monte_carlo_aquaculture',
-                'generated_at': datetime.now().isoformat(),
-                'n_simulations': self.n_simulations,
-                'time_horizon_days': self.time_horizon_days,
-                'time_steps': self.time_steps
-            },
+            'metadata': self._metadata(),
             'summary_statistics': self.summary_stats,
             'scenarios': scenarios_export
         }
+        if self.fan_charts is not None:
+            output['fan_charts'] = self.fan_charts
         
         # Write to file
         with open(filepath, 'w') as f:
             json.dump(output, f, indent=2)
         
-        file_size_mb = len(json.dumps(output)) / (1024 * 1024)
+        file_size_mb = os.path.getsize(filepath) / (1024 * 1024)
         print(f"✓ Saved {len(scenarios_export)} scenarios to {filepath}")
         print(f"  File size: {file_size_mb:.2f} MB")
+
+    def write_to_npz(self,
+                     filepath: str,
+                     include_paths: bool = False,
+                     path_dtype=np.float32):
+        """Binary columnar counterpart of write_to_json: one array per
+        scenario column, paths as (n, time_steps + 1) arrays in path_dtype,
+        metadata and summary statistics as embedded JSON strings"""
+        arrays = self._npz_arrays(include_paths, path_dtype)
+
+        # uncompressed so readers pay no decode cost
+        with open(filepath, 'wb') as f:
+            np.savez(f, **arrays)
+
+        file_size_mb = os.path.getsize(filepath) / (1024 * 1024)
+        print(f"✓ Saved {len(self.scenarios)} scenarios to {filepath}")
+        print(f"  File size: {file_size_mb:.2f} MB")
+
+    def _npz_arrays(self, include_paths: bool, path_dtype=np.float32) -> Dict[str, np.ndarray]:
+        if include_paths and not self.scenarios.has_paths:
+            raise ValueError("Scenario paths were not kept for this run (keep_paths=False)")
+        arrays = {
+            'format_version': np.array(NPZ_FORMAT_VERSION),
+            'metadata': np.array(json.dumps(self._metadata())),
+            'summary_statistics': np.array(json.dumps(self.summary_stats)),
+        }
+        for key, values in self.scenarios.columns.items():
+            arrays[f'scenario.{key}'] = values
+        if include_paths:
+            for key, values in self.scenarios.paths.items():
+                arrays[f'path.{key}'] = values.astype(path_dtype, copy=False)
+        if self.scenario_index is not None:
+            arrays.update({f'index.{key}': value for key, value in self.scenario_index.to_arrays().items()})
+        if self.fan_charts is not None:
+            for kind, chart in self.fan_charts.items():
+                if isinstance(chart, dict):
+                    arrays.update({f'fan.{kind}.{stat}': np.array(band) for stat, band in chart.items()})
+                else:
+                    arrays[f'fan.{kind}'] = np.array(chart)
+        return arrays
     
     def generate_risk_report(self) -> Dict:
-        df = pd.DataFrame(self.scenarios)
-        
+        if self.streaming_summary is not None:
+            return self._generate_streaming_risk_report()
+
+        # everything order-based is read off the index built with the results
+        index = self.scenario_index
+        n = len(index)
+        levels = [1, 5, 10, 25, 50, 75, 90, 95, 99]
+        metrics = risk_metrics(index.sorted_profit, percentiles=levels, confidence_levels=(),
+                               thresholds=(0, 1000), presorted=True)
+        below = {threshold: counts['below'] for threshold, counts in metrics['tail_counts'].items()}
+
+        def extremes(indices):
+            return [{key: self.scenarios[key][i].item() for key in ('simulation_id', 'profit', 'roi')}
+                    for i in indices]
+
         report = {
             'risk_summary': self.summary_stats,
             
             'profit_distribution': {
-                'percentiles': {
-                    'p01': float(np.percentile(df['profit'], 1)),
-                    'p05': float(np.percentile(df['profit'], 5)),
-                    'p10': float(np.percentile(df['profit'], 10)),
-                    'p25': float(np.percentile(df['profit'], 25)),
-                    'p50': float(np.percentile(df['profit'], 50)),
-                    'p75': float(np.percentile(df['profit'], 75)),
-                    'p90': float(np.percentile(df['profit'], 90)),
-                    'p95': float(np.percentile(df['profit'], 95)),
-                    'p99': float(np.percentile(df['profit'], 99))
-                }
+                'percentiles': {f'p{p:02d}': metrics[f'p{p:02d}'] for p in levels}
             },
             
             'scenario_breakdown': {
-                'loss_scenarios': int(np.sum(df['profit'] < 0)),
-                'breakeven_scenarios': int(np.sum((df['profit'] >= 0) & (df['profit'] < 1000))),
-                'profit_scenarios': int(np.sum(df['profit'] >= 1000)),
-                'high_profit_scenarios': int(np.sum(df['profit'] > df['profit'].quantile(0.9)))
+                'loss_scenarios': below[0],
+                'breakeven_scenarios': below[1000] - below[0],
+                'profit_scenarios': n - below[1000],
+                'high_profit_scenarios': n - index.count_below(metrics['p90'], inclusive=True)
+            },
+
+            'extreme_scenarios': {
+                'best': extremes(index.best(10)),
+                'worst': extremes(index.worst(10))
             },
             
-            'recommendations': self._generate_recommendations(df)
+            'recommendations': self._generate_recommendations(
+                float(np.mean(self.scenarios['n_mortality_events'])))
         }
         
         return report
+
+    def _generate_streaming_risk_report(self) -> Dict:
+        summary = self.streaming_summary
+        levels = [1, 5, 10, 25, 50, 75, 90, 95, 99]
+        values = summary.profit_sketch.quantiles([p / 100 for p in levels])
+        return {
+            'risk_summary': self.summary_stats,
+            'profit_distribution': {
+                'percentiles': {f'p{p:02d}': float(v) for p, v in zip(levels, values)}
+            },
+            'scenario_breakdown': {
+                'loss_scenarios': summary.counts['loss'],
+                'breakeven_scenarios': summary.counts['breakeven'],
+                'profit_scenarios': summary.counts['profit_over_1000'],
+                'high_profit_scenarios': summary.count - summary.profit_sketch.rank(values[6])
+            },
+            'recommendations': self._generate_recommendations(summary.mean_mortality_events)
+        }
     
-    def _generate_recommendations(self, df: pd.DataFrame) -> List[str]:
+    def _generate_recommendations(self, mean_mortality_events: float) -> List[str]:
         """Generate actionable recommendations based on simulation results"""
         recommendations = []
         
@@ -300,7 +2679,7 @@ class MonteCarlo_Simulation:
                 f"Strong expected returns (ROI: {mean_roi*100:.1f}%). Continue current strategy."
             )
         
-        if df['n_mortality_events'].mean() > 2:
+        if mean_mortality_events > 2:
             recommendations.append(
                 "High mortality event frequency. Improve biosecurity and health monitoring."
             )
@@ -308,6 +2687,240 @@ class MonteCarlo_Simulation:
         return recommendations
 
 
+def read_results_npz(filepath: str, include_paths: bool = True) -> Dict:
+    """Load a file written by write_to_npz into plain arrays:
+    {'metadata', 'summary_statistics', 'scenarios': {column: array},
+     'paths': {path_type: array}, 'scenario_index': ScenarioIndex or None}, plus
+    'fan_charts' when the run had them"""
+    with np.load(filepath, allow_pickle=False) as data:
+        results = {
+            'metadata': json.loads(data['metadata'].item()),
+            'summary_statistics': json.loads(data['summary_statistics'].item()),
+            'scenarios': {},
+            'paths': {}
+        }
+        index_arrays = {}
+        for key in data.files:
+            group, _, name = key.partition('.')
+            if group == 'scenario':
+                results['scenarios'][name] = data[key]
+            elif group == 'path' and include_paths:
+                results['paths'][name] = data[key]
+            elif group == 'index':
+                index_arrays[name] = data[key]
+            elif group == 'fan':
+                kind, _, stat = name.partition('.')
+                fan = results.setdefault('fan_charts', {})
+                if stat:
+                    fan.setdefault(kind, {})[stat] = data[key]
+                else:
+                    fan[kind] = data[key]
+    # files written before the index existed get one built on load; streaming
+    # runs have no scenario columns and so no index
+    results['scenario_index'] = None
+    if index_arrays:
+        results['scenario_index'] = ScenarioIndex.from_arrays(index_arrays)
+    elif 'profit' in results['scenarios']:
+        results['scenario_index'] = ScenarioIndex.build(results['scenarios'])
+    return results
+
+
+def _tail_stats(values: np.ndarray) -> Dict:
+    metrics = risk_metrics(values, percentiles=())
+    stats = {'mean': metrics['mean'],
+             'std': metrics['std'],
+             'prob_loss': metrics['tail_counts'][0.0]['below'] / metrics['n']}
+    stats.update({metric: metrics[metric] for metric in RISK_METRIC_LEVELS})
+    return stats
+
+
+def portfolio_risk_contributions(site_profits: np.ndarray, site_ids: List, label: str = 'site_id') -> Dict:
+    """Portfolio VaR/CVaR from an (n_scenarios, n_sites) profit matrix with
+    each site's marginal (Euler) contribution.
+
+    The CVaR contribution of a site is its mean profit over the portfolio
+    tail, so contributions add up to the portfolio CVaR exactly. VaR
+    contributions average site profits over scenarios ranked next to the VaR
+    scenario and are rescaled to add up to the portfolio VaR."""
+    n = len(site_profits)
+    total = site_profits.sum(axis=1)
+    order = np.argsort(total, kind='stable')
+    window = max(1, int(0.005 * n))
+    portfolio = _tail_stats(total)
+
+    sites = [{label: site_id, 'standalone': _tail_stats(site_profits[:, i]),
+              'contributions': {'mean': float(np.mean(site_profits[:, i]))}}
+             for i, site_id in enumerate(site_ids)]
+    diversification = {}
+    for metric, p in RISK_METRIC_LEVELS.items():
+        if metric.startswith('var'):
+            rank = int(np.clip(round(p * (n - 1)), 0, n - 1))
+            near = order[max(0, rank - window):rank + window + 1]
+            contributions = site_profits[near].mean(axis=0)
+            window_total = contributions.sum()
+            if window_total != 0:
+                contributions = contributions * portfolio[metric] / window_total
+        else:
+            contributions = site_profits[total <= np.percentile(total, 100 * p)].mean(axis=0)
+        for site, value in zip(sites, contributions):
+            site['contributions'][metric] = float(value)
+        # profit-side tail metrics: positive means the portfolio tail is less
+        # severe than the sum of the standalone tails
+        diversification[metric] = float(portfolio[metric] - sum(s['standalone'][metric] for s in sites))
+
+    return {'n_simulations': n,
+            'n_sites': len(site_ids),
+            'portfolio': portfolio,
+            'sites': sites,
+            'diversification_benefit': diversification}
+
+
+def parameter_grid(**values: List) -> List[Dict]:
+    """Cartesian product of parameter values as a list of override dicts"""
+    names = list(values)
+    return [dict(zip(names, combo)) for combo in itertools.product(*values.values())]
+
+
+def finite_difference_sensitivities(summary: pd.DataFrame,
+                                    parameters: List[str],
+                                    metrics: List[str]) -> pd.DataFrame:
+    """d(metric)/d(parameter) for each set along each swept parameter,
+    holding the other swept parameters fixed: central differences inside
+    the grid and one-sided differences at its edges. Lines with fewer than
+    two distinct values of the parameter are skipped."""
+    frames = []
+    for parameter in parameters:
+        others = [p for p in parameters if p != parameter]
+        groups = summary.groupby(others, sort=False) if others else [((), summary)]
+        for _, group in groups:
+            group = group.sort_values(parameter, kind='stable')
+            x = group[parameter].to_numpy()
+            if len(x) < 2 or len(np.unique(x)) != len(x):
+                continue
+            frame = pd.DataFrame({'set_id': group['set_id'].to_numpy(),
+                                  'parameter': parameter,
+                                  'value': x})
+            for metric in metrics:
+                frame[f'd_{metric}'] = np.gradient(group[metric].to_numpy(), x)
+            frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=['set_id', 'parameter', 'value'] + [f'd_{m}' for m in metrics])
+    return pd.concat(frames, ignore_index=True)
+
+
+def sites_from_dataset(records: List[Dict],
+                       n_fish: int = 10000,
+                       initial_weight: float = 50.0) -> List[Dict]:
+    """Portfolio site list from dataset records: one entry per site_id with
+    its most common regulatory zone and species"""
+    by_site = {}
+    for record in records:
+        by_site.setdefault(record['site_id'], []).append(record)
+    sites = []
+    for site_id in sorted(by_site):
+        rows = pd.DataFrame(by_site[site_id])
+        sites.append({'site_id': site_id,
+                      'regulatory_zone': rows['regulatory_zone'].mode().iloc[0],
+                      'species': rows['species'].mode().iloc[0],
+                      'n_fish': n_fish,
+                      'initial_weight': initial_weight})
+    return sites
+
+
+def _unit_params(units: List[Dict],
+                 market_params: Dict,
+                 growth_params: Dict,
+                 cost_params: Dict) -> Tuple[Dict, Dict, Dict]:
+    """Per-unit parameter arrays, shape (n_units,), from the shared dicts and
+    each unit's 'market_params'/'growth_params'/'cost_params' overrides"""
+    params = []
+    for key, shared in (('market_params', market_params),
+                        ('growth_params', growth_params),
+                        ('cost_params', cost_params)):
+        merged = [{**shared, **unit.get(key, {})} for unit in units]
+        params.append({name: np.array([m[name] for m in merged], dtype=np.float64)
+                       for name in shared})
+    return tuple(params)
+
+
+def cohorts_from_dataset(records: List[Dict],
+                         growth_params: Dict,
+                         n_fish: int = 10000,
+                         initial_weight: float = 50.0,
+                         spread: float = 0.25) -> List[Dict]:
+    """Farm cohort list from dataset records: one cohort per record (a
+    cohort in one cage of one site) with its own initial weight, growth rate
+    and survival.
+
+    The dataset stores initial_weight_g, growth_rate_g_day and
+    survival_rate_pct as standardized scores rather than physical units, so
+    each record's score z (relative to all records) moves the reference
+    values: initial_weight and growth_rate scale by exp(spread * z), and
+    base_survival shifts by spread * (1 - base_survival) * z within
+    [0.5, 0.99]."""
+    if not records:
+        raise ValueError("cohorts_from_dataset needs at least one record")
+    scores = {}
+    for field in ('initial_weight_g', 'growth_rate_g_day', 'survival_rate_pct'):
+        values = np.array([record[field] for record in records], dtype=np.float64)
+        std = values.std()
+        scores[field] = (values - values.mean()) / std if std > 0 else np.zeros_like(values)
+
+    weights = initial_weight * np.exp(spread * scores['initial_weight_g'])
+    growth_rates = growth_params['growth_rate'] * np.exp(spread * scores['growth_rate_g_day'])
+    base_survival = growth_params['base_survival']
+    survival = np.clip(base_survival + spread * (1 - base_survival) * scores['survival_rate_pct'], 0.5, 0.99)
+    return [{'cohort_id': record['cohort_id'],
+             'site_id': record['site_id'],
+             'cage_id': record['cage_id'],
+             'species': record['species'],
+             'regulatory_zone': record['regulatory_zone'],
+             'n_fish': n_fish,
+             'initial_weight': float(weight),
+             'growth_params': {'growth_rate': float(rate), 'base_survival': float(surv)}}
+            for record, weight, rate, surv in zip(records, weights, growth_rates, survival)]
+
+
+def _process_shard(simulator: MonteCarlo_Simulation,
+                   rng: np.random.Generator,
+                   start: int,
+                   n_paths: int,
+                   params: Tuple[Dict, Dict, Dict, Dict],
+                   options: Optional[Dict] = None):
+    """Simulate one shard and apply the per-shard run options"""
+    options = options or {}
+    batch = simulator._simulate_batch(n_paths, *params, rng=rng)
+    # the fan chart reads the paths, so it is built before the archive drops them
+    fan = FanChart.from_batch(batch) if options.get('fan_charts') else None
+    if options.get('path_dir'):
+        PathArchive.write_shard(options['path_dir'], start, batch)
+    if options.get('streaming'):
+        # only full Sobol shards are comparable replicates
+        result = StreamingSummary.from_batch(batch, replicate=n_paths == options.get('replicate_size'))
+        result.fan_chart = fan
+    else:
+        if options.get('keep_paths', True):
+            result = batch
+        else:
+            result = {key: value for key, value in batch.items() if key not in ScenarioStore.PATH_COLUMNS}
+        if fan is not None:
+            result['fan_chart'] = fan
+    if options.get('checkpoint_dir'):
+        RunCheckpoint.write_shard(options['checkpoint_dir'], start, result)
+    return result
+
+
+def _simulate_shard(config: Dict,
+                    rng: np.random.Generator,
+                    start: int,
+                    n_paths: int,
+                    params: Tuple[Dict, Dict, Dict, Dict],
+                    options: Optional[Dict] = None):
+    """Worker entry point: simulate one shard with its own generator"""
+    simulator = MonteCarlo_Simulation(**config)
+    return _process_shard(simulator, rng, start, n_paths, params, options)
+
+
 # Example usage demonstration
 if __name__ == "__main__":
     # Initialize simulator
@@ -348,11 +2961,14 @@ if __name__ == "__main__":
         'sigma': 50.0  # Cost volatility
     }
     
-    # Run simulation
-    results_df = mc.run_simulation(site_params, market_params, growth_params, cost_params)
+    # Run simulation (vectorized=True generates all paths as arrays at once;
+    # fan_charts keeps per-timestep bands for the dashboard without the paths)
+    results_df = mc.run_simulation(site_params, market_params, growth_params, cost_params,
+                                   vectorized=True, keep_paths=False, fan_charts=True)
     
     # Save results
     mc.write_to_json('monte_carlo_results.json', include_paths=False)
+    mc.write_to_npz('monte_carlo_results.npz', include_paths=False)
     
     # Generate risk report
     risk_report = mc.generate_risk_report()
@@ -363,4 +2979,18 @@ if __name__ == "__main__":
     print(f"Probability of Loss: {risk_report['risk_summary']['prob_loss']*100:.1f}%")
     print("\nRecommendations:")
     for rec in risk_report['recommendations']:
-        print(f"  {rec}")
\ No newline at end of file
+        print(f"  {rec}")
+    # Whole-farm run: one cohort per dataset record, aggregated by site,
+    # species and regulatory zone
+    dataset_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'aquaculture_dataset.json')
+    if os.path.exists(dataset_path):
+        with open(dataset_path) as f:
+            cohorts = cohorts_from_dataset(json.load(f), growth_params)
+        farm = MonteCarlo_Simulation(n_simulations=2000, time_horizon_days=180, time_steps=60,
+                                     random_seed=42).run_cohorts(cohorts, market_params,
+                                                                 growth_params, cost_params)
+        print("\n=== FARM RISK ===")
+        print(f"Mean Profit: ${farm['farm']['mean']:,.2f}  95% CVaR: ${farm['farm']['cvar_95']:,.2f}")
+        for group in farm['by_species']['groups']:
+            print(f"  Species {group['species']}: mean ${group['standalone']['mean']:,.2f}, "
+                  f"CVaR contribution ${group['contributions']['cvar_95']:,.2f}")
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# the app imports its modules from src/ (e.g. stats.monte_carlo)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+@pytest.fixture
+def params():
+    site_params = {'site_id': 1, 'species': 'Salmon', 'n_fish': 10000, 'initial_weight': 50.0}
+    market_params = {'initial_price': 15.50, 'drift': 0.05, 'volatility': 0.25}
+    growth_params = {'growth_rate': 0.015, 'growth_vol': 0.05, 'jump_intensity': 0.01,
+                     'jump_mean': -0.10, 'jump_std': 0.05, 'base_survival': 0.92}
+    cost_params = {'initial_cost': 5.0, 'theta': 0.5, 'mean_cost': 5.0, 'sigma': 0.1}
+    return site_params, market_params, growth_params, cost_params
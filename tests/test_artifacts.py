@@ -0,0 +1,25 @@
+from artifacts import ArtifactLoader
+
+
+def test_higher_priority_candidate_written_later_is_loaded(tmp_path):
+    npz, json_path = tmp_path / 'results.npz', tmp_path / 'results.json'
+    loader = ArtifactLoader()
+    loader.register('results', [str(npz), str(json_path)], lambda path: path)
+
+    assert loader.get('results') is None
+    json_path.write_text('{}')
+    assert loader.get('results') == str(json_path)
+    npz.write_bytes(b'npz')
+    assert loader.get('results') == str(npz)
+    npz.unlink()
+    assert loader.get('results') == str(json_path)
+
+
+def test_unchanged_file_is_parsed_once(tmp_path):
+    path = tmp_path / 'results.json'
+    path.write_text('{}')
+    loader = ArtifactLoader()
+    loader.register('results', [str(path)], lambda p: object())
+
+    assert loader.get('results') is loader.get('results')
+    assert loader.stats()['results']['loads'] == 1
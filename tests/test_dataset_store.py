@@ -0,0 +1,18 @@
+from dataset_store import AggregateCache
+
+
+def test_request_holding_the_empty_store_cannot_switch_the_cache_back():
+    cache = AggregateCache()
+    cache.get('summary', None, lambda: 'empty')
+    cache.get('summary', 'v1', lambda: 'v1')
+
+    assert cache.get('summary', None, lambda: 'stale') == 'stale'
+    assert cache.stats()['version'] == 'v1'
+    assert cache.get('summary', 'v1', lambda: 'recomputed') == 'v1'
+
+
+def test_retired_versions_are_bounded():
+    cache = AggregateCache()
+    for version in range(100):
+        cache.get('summary', str(version), lambda: version)
+    assert len(cache.retired) == AggregateCache.RETIRED_VERSIONS
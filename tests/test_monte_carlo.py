@@ -0,0 +1,160 @@
+import json
+
+import numpy as np
+import pytest
+from scipy.stats import ks_2samp
+
+from stats.monte_carlo import MonteCarlo_Simulation, QuantileSketch, ResultCache
+
+
+def simulator(n_simulations=2000, **kwargs):
+    return MonteCarlo_Simulation(n_simulations=n_simulations, time_horizon_days=60,
+                                 time_steps=20, random_seed=7, **kwargs)
+
+
+def cache_entry(n):
+    """write_to_npz style arrays with n profit values"""
+    return {'metadata': np.array(json.dumps({})),
+            'summary_statistics': np.array(json.dumps({})),
+            'scenario.profit': np.zeros(n)}
+
+
+def test_batched_results_do_not_depend_on_worker_count(params):
+    serial, pooled = simulator(), simulator()
+    serial.run_simulation(*params, vectorized=True, batch_size=500, n_workers=1)
+    pooled.run_simulation(*params, vectorized=True, batch_size=500, n_workers=2)
+    for key in ('profit', 'roi', 'n_mortality_events'):
+        np.testing.assert_array_equal(serial.scenarios[key], pooled.scenarios[key])
+    np.testing.assert_array_equal(serial.scenarios['price_path'], pooled.scenarios['price_path'])
+
+
+def test_checkpoint_extension_is_bit_identical(params, tmp_path):
+    fresh = simulator(4000)
+    fresh.run_simulation(*params, batch_size=500, checkpoint_dir=str(tmp_path / 'fresh'))
+
+    simulator(2000).run_simulation(*params, batch_size=500, checkpoint_dir=str(tmp_path / 'resumed'))
+    resumed = simulator(4000)
+    resumed.run_simulation(*params, batch_size=500, checkpoint_dir=str(tmp_path / 'resumed'))
+
+    for key in ('profit', 'final_price', 'surviving_fish'):
+        np.testing.assert_array_equal(fresh.scenarios[key], resumed.scenarios[key])
+    assert fresh.summary_stats == resumed.summary_stats
+
+
+@pytest.mark.parametrize('options', [{'sampling': 'antithetic'},
+                                     {'sampling': 'sobol'},
+                                     {'control_variate': True}])
+def test_variance_reduction_matches_scalar_engine(params, options):
+    scalar = simulator(2000)
+    scalar.run_simulation(*params)
+    reduced = simulator(4096, **options)
+    reduced.run_simulation(*params, batch_size=512)
+
+    assert ks_2samp(scalar.scenarios['profit'], reduced.scenarios['profit']).pvalue > 1e-3
+    se = np.hypot(scalar.summary_stats['standard_errors']['mean_profit'],
+                  reduced.summary_stats['standard_errors']['mean_profit'])
+    assert abs(scalar.summary_stats['mean_profit'] - reduced.summary_stats['mean_profit']) < 4 * se
+
+
+def test_sobol_standard_errors_come_from_scramble_replicates(params):
+    site, market, growth, cost = params
+    # without growth noise the profit depends on the QMC price/cost draws only
+    growth = dict(growth, growth_vol=0.0, jump_intensity=0.0)
+    pseudo, sobol = simulator(4096), simulator(4096, sampling='sobol')
+    pseudo.run_simulation(site, market, growth, cost, vectorized=True, batch_size=512)
+    sobol.run_simulation(site, market, growth, cost, batch_size=512)
+
+    assert (sobol.summary_stats['standard_errors']['mean_profit']
+            < pseudo.summary_stats['standard_errors']['mean_profit'] / 3)
+    assert sobol.summary_stats['effective_sample_size']['mean_profit'] > 4096
+
+    streaming = simulator(4096, sampling='sobol')
+    streaming.run_simulation(site, market, growth, cost, batch_size=512, streaming=True)
+    assert (streaming.summary_stats['standard_errors']['mean_profit']
+            < pseudo.summary_stats['standard_errors']['mean_profit'] / 3)
+
+
+def test_adaptive_run_keeps_the_budget(params):
+    mc = simulator(8000)
+    mc.run_simulation(*params, batch_size=1000, n_workers=1, tolerances={'mean_profit': 1e12})
+    assert mc.n_simulations == 8000
+    assert mc.n_completed == mc.adaptive_run['n_simulations'] < 8000
+    assert mc.summary_stats['n_simulations'] == mc.n_completed
+
+
+def test_scalar_engine_returns_path_columns_by_default(params):
+    df = simulator(50).run_simulation(*params)
+    assert {'price_path', 'weight_path', 'cost_path'} <= set(df.columns)
+    df = simulator(50).run_simulation(*params, vectorized=True)
+    assert 'price_path' not in df.columns
+
+
+def test_cache_round_trip_is_exact(params, tmp_path):
+    cache = ResultCache(str(tmp_path))
+    first = simulator()
+    first.run_simulation(*params, vectorized=True, batch_size=500, cache=cache)
+    second = simulator()
+    second.run_simulation(*params, vectorized=True, batch_size=500, cache=cache)
+
+    assert cache.stats()['hits'] == 1
+    for key in first.scenarios.columns:
+        np.testing.assert_array_equal(first.scenarios[key], second.scenarios[key])
+    for key in first.scenarios.paths:
+        np.testing.assert_array_equal(first.scenarios.paths[key], second.scenarios.paths[key])
+    assert first.summary_stats == second.summary_stats
+
+
+def test_oversized_cache_entry_leaves_other_entries(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=200_000)
+    for i in range(3):
+        cache.put(f'small{i}', cache_entry(1000))
+    with pytest.warns(RuntimeWarning):
+        assert not cache.put('large', cache_entry(100_000))
+
+    stats = cache.stats()
+    assert (stats['entries'], stats['evictions'], stats['skipped']) == (3, 0, 1)
+    assert 'large' not in cache
+
+
+def test_cache_evicts_only_older_entries_until_the_new_one_fits(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=200_000)
+    for i in range(3):
+        cache.put(f'entry{i}', cache_entry(8000))
+    cache.get('entry0')
+    cache.put('new', cache_entry(10_000))
+
+    assert 'new' in cache and 'entry0' in cache
+    assert 'entry1' not in cache
+    assert cache.stats()['bytes'] <= 200_000
+
+
+def test_cache_adopts_files_missing_from_the_index(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=200_000)
+    cache.put('indexed', cache_entry(1000))
+    np.savez(tmp_path / 'orphan.npz', **cache_entry(1000))
+
+    assert 'orphan' in cache
+    assert cache.stats()['entries'] == 2
+
+
+def test_quantile_sketch_relative_error_bound():
+    rng = np.random.default_rng(0)
+    values = rng.lognormal(0, 3, 100_000) - 5
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for chunk in np.array_split(values, 10):
+        part = QuantileSketch(relative_accuracy=0.01)
+        part.add(chunk)
+        sketch.merge(part)
+
+    ordered = np.sort(values)
+    qs = np.array([0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99])
+    exact = ordered[np.floor(qs * (len(values) - 1)).astype(int)]
+    assert sketch.folded == 0
+    np.testing.assert_allclose(sketch.quantiles(qs), exact, rtol=0.01)
+
+
+def test_quantile_sketch_reports_folding():
+    values = np.random.default_rng(0).lognormal(0, 3, 100_000) - 5
+    sketch = QuantileSketch(max_buckets=64)
+    sketch.add(values)
+    assert sketch.folded > 0